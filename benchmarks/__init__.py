@@ -0,0 +1,38 @@
+"""
+.. module:: benchmarks
+   :synopsis: Offline benchmarks for the trivia bot hot paths.
+
+Every benchmark module has a ``run(quick=False)`` function returning
+its results as made by :func:`result`; ``python -m benchmarks`` runs
+them all.
+"""
+import timeit
+
+def best_time(function, repeat=5, number=1):
+    """Return the best time in seconds of `number` calls of `function`
+    over `repeat` runs.
+    """
+    return min(timeit.repeat(function, number=number, repeat=repeat))
+
+def result(name, params, seconds, ops=1):
+    """Make a benchmark result.
+
+    Parameters
+    ----------
+    name : str
+        The benchmark, e.g. "editdistance.LEVENSHTEIN".
+    params : dict
+        The parameters of the run, e.g. {"length": 10}. Runs of the
+        same benchmark with equal parameters are compared.
+    seconds : float
+        The time taken for `ops` operations.
+    ops : int, optional
+        Number of operations (comparisons, lines, ...) timed.
+
+    Returns
+    -------
+    dict
+        The result, with the time per operation in "seconds".
+    """
+    return {"name": name, "params": params, "seconds": seconds / ops,
+            "ops": ops}
@@ -0,0 +1,73 @@
+"""Run the benchmark suite and save or compare its results.
+
+Run from the repository root with::
+
+    python -m benchmarks [--quick] [--only NAME ...] [--json FILE]
+                         [--compare FILE]
+
+Results are printed as a table and can be written as JSON, so that a
+later run can be compared against them with ``--compare``.
+"""
+import argparse
+import datetime
+import importlib
+import json
+import platform
+import sys
+
+#: The benchmark modules, by the name used with --only
+SUITES = ["editdistance", "matcher", "irc", "quizset", "scores"]
+
+def key(item):
+    """Identify a result across runs."""
+    return item["name"], json.dumps(item["params"], sort_keys=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true",
+                        help="small sizes and single runs, for a smoke test")
+    parser.add_argument("--only", nargs="+", choices=SUITES, default=SUITES,
+                        metavar="NAME", help="run only these suites: "
+                        + ", ".join(SUITES))
+    parser.add_argument("--json", metavar="FILE",
+                        help="write the results to FILE")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare with the results saved in FILE")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fp:
+            baseline = {key(item): item for item in json.load(fp)["results"]}
+
+    results = []
+    for suite in args.only:
+        module = importlib.import_module(f"benchmarks.bench_{suite}")
+        for item in module.run(quick=args.quick):
+            results.append(item)
+            params = " ".join(f"{name}={value}"
+                              for name, value in item["params"].items())
+            line = (f"{item['name']:<36} {params:<34} "
+                    f"{item['seconds'] * 1e6:14.3f} us")
+            old = baseline.get(key(item))
+            if old is not None:
+                # above 1 is slower than the baseline
+                line += f" {item['seconds'] / old['seconds']:7.2f}x"
+            print(line, flush=True)
+
+    if args.json:
+        report = {
+            "meta": {
+                "time": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "quick": args.quick,
+            },
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as fp:
+            json.dump(report, fp, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+.. module:: bench_editdistance
+   :synopsis: Per-comparison cost of the edit distance engines.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_editdistance
+"""
+import random
+import string
+import timeit
+
+import benchmarks
+import editdistance
+from editdistance import DistanceAlgorithm, EditDistance
+
+ALGORITHMS = [DistanceAlgorithm.DAMERUAUOSA,
+              DistanceAlgorithm.DAMERAUOSA_BITPARALLEL]
+ALPHABET = string.ascii_lowercase + " "
+#: Lengths of the answers and messages compared by :func:`run`
+LENGTHS = (5, 15, 30, 60)
+#: Maximum distances used by :func:`run`: tight, loose and unbounded
+MAX_DISTANCES = (1, 3, 2 ** 31 - 1)
+
+def make_pairs(num_answers, per_answer, min_len=5, max_len=30, seed=0):
+    """Create (answer, message) pairs resembling trivia chat: every
+    answer is compared against a run of messages that are either the
+    answer with a few typos or unrelated text. Exact answers are left
+    out since both engines return those without running the kernel.
+
+    Parameters
+    ----------
+    num_answers : int
+        Number of distinct answers.
+    per_answer : int
+        Number of chat messages compared against each answer.
+    min_len : int, optional
+        Minimum answer and message length.
+    max_len : int, optional
+        Maximum answer and message length.
+    seed : int, optional
+        Seed for the random generator, so runs are reproducible.
+
+    Returns
+    -------
+    list of (str, str)
+        The answer/message pairs.
+    """
+    rng = random.Random(seed)
+
+    def word(length):
+        return "".join(rng.choice(ALPHABET) for _ in range(length))
+
+    pairs = []
+    for _ in range(num_answers):
+        answer = word(rng.randint(min_len, max_len))
+        for i in range(per_answer):
+            if i % 2:
+                chars = list(answer)
+                for _ in range(rng.randint(1, 3)):
+                    chars[rng.randrange(len(chars))] = rng.choice(ALPHABET)
+                message = "".join(chars)
+            else:
+                message = word(rng.randint(min_len, max_len))
+            pairs.append((answer, message))
+    return pairs
+
+def time_per_compare(comparer, pairs, max_distance, repeat=5):
+    """Return the best per-comparison time in seconds over `repeat`
+    passes through `pairs`.
+    """
+    def run():
+        for answer, message in pairs:
+            comparer.compare(answer, message, max_distance)
+    return min(timeit.repeat(run, number=1, repeat=repeat)) / len(pairs)
+
+def backends():
+    """Yield the backends of the bit-parallel engine, "compiled" (only
+    if rapidfuzz is installed) and "python", each while it is in use.
+    """
+    compiled = editdistance._compiled_osa
+    if compiled is not None:
+        yield "compiled"
+    editdistance._compiled_osa = None
+    try:
+        yield "python"
+    finally:
+        editdistance._compiled_osa = compiled
+
+def run(quick=False):
+    """Time every engine, including Levenshtein, for each string length
+    in :data:`LENGTHS` and maximum distance in :data:`MAX_DISTANCES`.
+    The bit-parallel engine is timed with each of its backends.
+
+    Parameters
+    ----------
+    quick : bool, optional
+        Use fewer pairs and runs, for a smoke test.
+
+    Returns
+    -------
+    list of dict
+        The results, see :func:`benchmarks.result`.
+    """
+    results = []
+    num_answers, repeat = (5, 1) if quick else (20, 5)
+    for length in LENGTHS:
+        pairs = make_pairs(num_answers, 20, length, length, seed=length)
+        for algorithm in DistanceAlgorithm:
+            variants = [{}]
+            if algorithm == DistanceAlgorithm.DAMERAUOSA_BITPARALLEL:
+                variants = ({"backend": backend} for backend in backends())
+            for variant in variants:
+                comparer = EditDistance(algorithm)
+                for max_distance in MAX_DISTANCES:
+                    cost = time_per_compare(comparer, pairs, max_distance,
+                                            repeat)
+                    results.append(benchmarks.result(
+                        f"editdistance.{algorithm.name}",
+                        {"length": length, "max_distance": max_distance,
+                         **variant}, cost))
+    return results
+
+def main():
+    pairs = make_pairs(50, 30)
+    comparers = {algorithm: EditDistance(algorithm)
+                 for algorithm in ALGORITHMS}
+    for max_distance in (2 ** 31 - 1, 3):
+        results = [[comparer.compare(answer, message, max_distance)
+                    for answer, message in pairs]
+                   for comparer in comparers.values()]
+        assert all(result == results[0] for result in results), \
+            "Engines disagree"
+        baseline = None
+        print(f"max_distance={max_distance}")
+        for algorithm, comparer in comparers.items():
+            cost = time_per_compare(comparer, pairs, max_distance)
+            baseline = baseline or cost
+            print(f"  {algorithm.name:<24} {cost * 1e6:9.2f} us/compare "
+                  f"{baseline / cost:6.1f}x")
+
+if __name__ == "__main__":
+    main()
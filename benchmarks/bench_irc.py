@@ -0,0 +1,119 @@
+"""
+.. module:: bench_irc
+   :synopsis: Throughput of reading and parsing IRC lines.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_irc
+"""
+import asyncio
+import random
+
+import benchmarks
+import irc
+import twitchtriviabot as ttb
+
+#: Share of each kind of line in the synthetic traffic: chat in a
+#: joined channel, chat in a channel the bot has left, and other
+#: commands (JOIN, PART, numerics, ...); and whether lines carry IRCv3
+#: tags as with Twitch's tags capability
+TRAFFIC = {"chat": ((1.0, 0.0, 0.0), False),
+           "mixed": ((0.8, 0.05, 0.15), False),
+           "membership": ((0.2, 0.0, 0.8), False),
+           "tagged": ((0.8, 0.05, 0.15), True)}
+OTHER = [":{0}!{0}@{0}.tmi.twitch.tv JOIN #chan",
+         ":{0}!{0}@{0}.tmi.twitch.tv PART #chan",
+         ":tmi.twitch.tv 353 bot = #chan :{0}",
+         ":tmi.twitch.tv CLEARCHAT #chan :{0}",
+         ":tmi.twitch.tv USERNOTICE #chan :pacific"]
+TAGS = ("@badge-info=;badges=subscriber/12;color=#1E90FF;"
+        "display-name={0};emotes=;id=b34ccfc7-4977-403a-8a94-33c6bac34fb8;"
+        "mod=0;room-id=1337;subscriber=1;tmi-sent-ts=1507246572675;"
+        "user-id=1234 ")
+
+def make_lines(size, mix, tagged=False, seed=0):
+    """Create lines as received from Twitch.
+
+    Parameters
+    ----------
+    size : int
+        Number of lines.
+    mix : (float, float, float)
+        Shares of chat in the joined channel "#chan", chat in another
+        channel and other commands.
+    tagged : bool, optional
+        Start the lines with tags.
+    seed : int, optional
+        Seed for the random generator, so runs are reproducible.
+
+    Returns
+    -------
+    list of str
+        The lines, without the line terminators.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(size):
+        user = f"viewer{rng.randrange(5000)}"
+        kind = rng.choices(range(3), mix)[0]
+        if kind == 2:
+            line = rng.choice(OTHER).format(user)
+        else:
+            chan = "#chan" if kind == 0 else "#elsewhere"
+            message = rng.choice(["pacific ocean", "atlantic", "!score",
+                                  "what a question LUL", "pasific"])
+            line = (f":{user}!{user}@{user}.tmi.twitch.tv PRIVMSG "
+                    f"{chan} :{message}")
+        lines.append(TAGS.format(user) + line if tagged else line)
+    return lines
+
+def time_read_lines(lines, repeat):
+    """Return the best time in seconds to split `lines`, sent in reads
+    of 4096 bytes, with :func:`irc.read_lines`.
+    """
+    data = "".join(f"{line}\r\n" for line in lines).encode("utf-8")
+
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        async for _ in irc.read_lines(reader):
+            pass
+
+    return benchmarks.best_time(lambda: asyncio.run(read()), repeat)
+
+def run(quick=False):
+    """Time :func:`irc.read_lines` and the bot's line handler for each
+    traffic mix in :data:`TRAFFIC`.
+
+    Parameters
+    ----------
+    quick : bool, optional
+        Use fewer lines and runs, for a smoke test.
+
+    Returns
+    -------
+    list of dict
+        The results, see :func:`benchmarks.result`.
+    """
+    results = []
+    size, repeat = (2000, 1) if quick else (50000, 5)
+    ttb.Var.channels = {"#chan": ttb.ChannelVar("#chan", "userscores")}
+    for traffic, (mix, tagged) in TRAFFIC.items():
+        lines = make_lines(size, mix, tagged)
+        seconds = benchmarks.best_time(
+            lambda: [ttb.handle_line(line) for line in lines], repeat)
+        results.append(benchmarks.result(
+            "irc.handle_line", {"traffic": traffic}, seconds, size))
+    lines = make_lines(size, *TRAFFIC["mixed"])
+    results.append(benchmarks.result(
+        "irc.read_lines", {}, time_read_lines(lines, repeat), size))
+    return results
+
+def main():
+    for item in run():
+        print(f"{item['name']:<16} {item['params'].get('traffic', ''):<11}"
+              f"{item['seconds'] * 1e6:9.2f} us/line")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+.. module:: bench_matcher
+   :synopsis: Cost of matching bursts of chat messages against answers.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_matcher
+"""
+import random
+import string
+
+import benchmarks
+from matcher import AnswerMatcher
+
+ALPHABET = string.ascii_lowercase + " "
+#: Share of each kind of message in the synthetic chat corpora:
+#: unrelated chatter, guesses near the answer and emote/short spam
+CORPORA = {"chatter": (0.9, 0.05, 0.05),
+           "guessing": (0.2, 0.7, 0.1),
+           "spam": (0.1, 0.0, 0.9)}
+SPAM = ["lul", "pog", "kappa", "gg", "?", "!score", "lol", "f"]
+
+def make_corpus(answer, size, mix, seed=0):
+    """Create a burst of chat messages which does not contain the
+    answer, so that every message is evaluated.
+
+    Parameters
+    ----------
+    answer : str
+        The answer of the question.
+    size : int
+        Number of messages.
+    mix : (float, float, float)
+        Shares of chatter, near guesses and spam.
+    seed : int, optional
+        Seed for the random generator, so runs are reproducible.
+
+    Returns
+    -------
+    list of str
+        The messages.
+    """
+    rng = random.Random(seed)
+    messages = []
+    while len(messages) < size:
+        kind = rng.choices(range(3), mix)[0]
+        if kind == 0:
+            message = " ".join(
+                "".join(rng.choice(string.ascii_lowercase)
+                        for _ in range(rng.randint(2, 8)))
+                for _ in range(rng.randint(1, 6)))
+        elif kind == 1:
+            chars = list(answer)
+            for _ in range(rng.randint(len(answer) // 2, len(answer))):
+                chars[rng.randrange(len(chars))] = rng.choice(ALPHABET)
+            message = "".join(chars).title()
+        else:
+            message = rng.choice(SPAM)
+        if message.strip().lower() != answer:
+            messages.append(message)
+    return messages
+
+def run(quick=False):
+    """Time :meth:`matcher.AnswerMatcher.match_first` on bursts that
+    do not match, for each corpus in :data:`CORPORA`, before any hint
+    and after the last one.
+
+    Parameters
+    ----------
+    quick : bool, optional
+        Use fewer messages and runs, for a smoke test.
+
+    Returns
+    -------
+    list of dict
+        The results, see :func:`benchmarks.result`.
+    """
+    results = []
+    size, repeat = (200, 1) if quick else (2000, 5)
+    answers = ["the legend of zelda", "pacific"]
+    for corpus, mix in CORPORA.items():
+        messages = make_corpus(answers[0], size, mix)
+        for hint_req in (0, 2):
+            matcher = AnswerMatcher(answers)
+            seconds = benchmarks.best_time(
+                lambda: matcher.match_first(messages, hint_req), repeat)
+            results.append(benchmarks.result(
+                "matcher.match_first",
+                {"corpus": corpus, "hint_req": hint_req}, seconds, size))
+    return results
+
+def main():
+    for item in run():
+        print(f"{item['params']['corpus']:<10} "
+              f"hint_req={item['params']['hint_req']} "
+              f"{item['seconds'] * 1e6:9.2f} us/message")
+
+if __name__ == "__main__":
+    main()
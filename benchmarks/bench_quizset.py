@@ -0,0 +1,93 @@
+"""
+.. module:: bench_quizset
+   :synopsis: Cost of loading trivia sets and building session quizsets.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_quizset
+
+Excel trivia sets are compiled once into the same kind of mapped bank
+as CSV sets, so only CSV sets are timed here.
+"""
+import csv
+import os
+import random
+import tempfile
+
+import benchmarks
+import questionbank
+
+#: Numbers of questions of the trivia sets timed by :func:`run`
+SIZES = (1000, 10000, 100000, 1000000)
+#: Number of questions drawn for a session
+SESSION_SIZE = 25
+
+def write_set(path, size, seed=0):
+    """Write a CSV trivia set with `size` questions, every tenth row
+    blank like the rows of the template.
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(["Game", "Question", "Answer", "Answer 2",
+                         "Creator"])
+        for number in range(size):
+            if number % 10 == 9:
+                writer.writerow([""] * 5)
+            writer.writerow([f"Game {rng.randrange(100)}",
+                             f"Question number {number}, with a comma?",
+                             f"answer {number}", "", "benchmark"])
+
+def run(quick=False):
+    """For each size in :data:`SIZES`, time opening a CSV set without
+    its index (which builds it), opening it with its index, and drawing
+    a session quizset.
+
+    Parameters
+    ----------
+    quick : bool, optional
+        Only use the two smallest sizes and fewer runs, for a smoke
+        test.
+
+    Returns
+    -------
+    list of dict
+        The results, see :func:`benchmarks.result`.
+    """
+    results = []
+    sizes, repeat = (SIZES[: 2], 1) if quick else (SIZES, 3)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            filename = os.path.join(directory, f"set{size}")
+            path = f"{filename}.csv"
+            write_set(path, size)
+            params = {"questions": size}
+
+            def cold():
+                if os.path.exists(f"{path}.cache"):
+                    os.remove(f"{path}.cache")
+                questionbank.load(filename, "csv").close()
+
+            def warm():
+                questionbank.load(filename, "csv").close()
+
+            results.append(benchmarks.result(
+                "quizset.index", params, benchmarks.best_time(cold, repeat)))
+            results.append(benchmarks.result(
+                "quizset.open", params, benchmarks.best_time(warm, repeat)))
+            bank = questionbank.load(filename, "csv")
+            assert len(bank) == size, "Questions missing from the set"
+            results.append(benchmarks.result(
+                "quizset.sample", params,
+                benchmarks.best_time(lambda: bank.sample(SESSION_SIZE),
+                                     repeat * 10)))
+            bank.close()
+    return results
+
+def main():
+    for item in run():
+        print(f"{item['name']:<15} {item['params']['questions']:>8} "
+              f"{item['seconds'] * 1e3:10.3f} ms")
+
+if __name__ == "__main__":
+    main()
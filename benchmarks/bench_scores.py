@@ -0,0 +1,119 @@
+"""
+.. module:: bench_scores
+   :synopsis: Cost of persisting user scores with each score backend.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_scores
+"""
+import json
+import os
+import random
+import tempfile
+import time
+
+import benchmarks
+import scorestore
+
+#: Numbers of users in the score stores timed by :func:`run`
+SIZES = (1000, 10000, 100000, 1000000)
+
+def make_scores(size, seed=0):
+    """Create the scores of `size` users, as kept by the score
+    stores.
+    """
+    rng = random.Random(seed)
+    return {f"user{number}": [0, rng.randrange(500), rng.randrange(20)]
+            for number in range(size)}
+
+def open_store(backend, directory, userscores):
+    """Create a store of the given backend ("json" or "sqlite") in
+    `directory` holding `userscores`, and return a function that opens
+    and loads it.
+    """
+    if backend == "json":
+        path = os.path.join(directory, "userscores.txt")
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump(userscores, fp)
+        new = lambda: scorestore.JsonScoreStore(path)
+    else:
+        path = os.path.join(directory, "userscores.db")
+        new = lambda: scorestore.SqliteScoreStore(path)
+        store = new()
+        store.load()
+        store.import_scores(userscores)
+        store.close()
+
+    def load():
+        store = new()
+        store.load()
+        return store
+    return load
+
+def time_answers(store, usernames, count):
+    """Return the time in seconds taken to record `count` correct
+    answers the way the bot does (session and overall points, then
+    the session leaderboard), including any compaction they cause.
+    """
+    started = time.perf_counter()
+    for number in range(count):
+        username = usernames[number % len(usernames)]
+        store.add(username, scorestore.SESSION, 1)
+        store.add(username, scorestore.OVERALL, 1)
+        store.top_session(3)
+    return time.perf_counter() - started
+
+def run(quick=False):
+    """For each backend and each number of users in :data:`SIZES`, time
+    loading the store, recording answers, reading the overall
+    leaderboard and ending a session (clearing session scores and
+    writing out all scores).
+
+    Parameters
+    ----------
+    quick : bool, optional
+        Only use the two smallest sizes and fewer answers, for a smoke
+        test.
+
+    Returns
+    -------
+    list of dict
+        The results, see :func:`benchmarks.result`.
+    """
+    results = []
+    sizes, answers = (SIZES[: 2], 200) if quick else (SIZES, 2000)
+    for size in sizes:
+        userscores = make_scores(size)
+        # a session is played by a small crowd of the known users
+        usernames = random.Random(size).sample(list(userscores), 50)
+        for backend in ("json", "sqlite"):
+            params = {"backend": backend, "users": size}
+            with tempfile.TemporaryDirectory() as directory:
+                load = open_store(backend, directory, userscores)
+                started = time.perf_counter()
+                store = load()
+                results.append(benchmarks.result(
+                    "scores.load", params, time.perf_counter() - started))
+                results.append(benchmarks.result(
+                    "scores.answer", params,
+                    time_answers(store, usernames, answers), answers))
+                results.append(benchmarks.result(
+                    "scores.top_overall", params,
+                    benchmarks.best_time(lambda: store.top_overall(3))))
+                started = time.perf_counter()
+                store.clear_session()
+                store.compact()
+                results.append(benchmarks.result(
+                    "scores.end_session", params,
+                    time.perf_counter() - started))
+                store.close()
+    return results
+
+def main():
+    for item in run():
+        print(f"{item['name']:<19} {item['params']['backend']:<7}"
+              f"{item['params']['users']:>8} "
+              f"{item['seconds'] * 1e3:10.3f} ms")
+
+if __name__ == "__main__":
+    main()
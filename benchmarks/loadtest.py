@@ -0,0 +1,506 @@
+"""
+.. module:: loadtest
+   :synopsis: Fake Twitch chat server and chat load generator.
+
+Runs the bot against a local stand-in for Twitch's IRC server and
+floods its channels with chat, then reports how quickly correct
+answers were recognized and how many chat lines the bot did not read.
+Run from the repository root with::
+
+    python -m benchmarks.loadtest --rate 1000 --duration 30
+
+The bot is started in a temporary directory with a generated trivia
+set and config. Use ``--no-bot`` to only run the server and point a
+bot started by hand at it (host 127.0.0.1, the given port, and the
+channels #load0, #load1, ...).
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import re
+import signal
+import string
+import sys
+import tempfile
+import time
+
+import irc
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG = """[Trivia]
+filename = triviaset
+filetype = csv
+num_qs = {num_qs}
+hint_time_1 = 20
+hint_time_2 = 40
+skiptime = 60
+delay = 1
+bonus_value = 3
+score_backend = json
+
+[Admin]
+admins = loadadmin
+
+[Bot]
+host = 127.0.0.1
+port = {port}
+nick = loadbot
+pass = oauth:loadtest
+chan = {channels}
+msg_limit = 100000
+join_limit = 1000
+metrics_port = {metrics_port}
+"""
+#: Words of the synthetic chatter
+NOISE = ["lul", "pog", "kappa", "gg", "what", "is", "this", "question",
+         "no", "idea", "lol", "the", "answer", "easy", "hard", "!score"]
+
+QUESTION = re.compile(r"Question (\d+): \[[^\]]*\] (.*)")
+ANSWERED = re.compile(r"(\S+) answers question #(\d+)")
+
+def percentile(values, q):
+    """Return the `q` quantile (0 to 1) of `values`, or None if there
+    are none.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def make_set(path, size, seed=0):
+    """Write a CSV trivia set whose answers are random words, and
+    return a dict mapping each question to its answer.
+    """
+    rng = random.Random(seed)
+    questions = {}
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write("Game,Question,Answer,Answer 2,Creator\n")
+        for number in range(size):
+            question = f"What is code word {number}?"
+            answer = "".join(rng.choice(string.ascii_lowercase)
+                             for _ in range(rng.randint(6, 14)))
+            questions[question] = answer
+            fp.write(f"Load,{question},{answer},,loadtest\n")
+    return questions
+
+def load_replay(path):
+    """Read recorded chat for replay.
+
+    Parameters
+    ----------
+    path : str
+        A text file with one chat message per line, either as raw IRC
+        lines (``:user!user@host PRIVMSG #chan :message``, optionally
+        with tags) or as the bare message.
+
+    Returns
+    -------
+    list of (str or None, str)
+        The username (None if not recorded) and message of each line.
+    """
+    messages = []
+    with open(path, encoding="utf-8", errors="replace") as fp:
+        for line in fp:
+            line = line.rstrip("\r\n")
+            username = None
+            if " PRIVMSG " in line:
+                prefix, _, rest = line.partition(" PRIVMSG ")
+                username = prefix.rpartition(" ")[2].lstrip(":")
+                username = username.partition("!")[0] or None
+                line = rest.partition(" :")[2]
+            if line:
+                messages.append((username, line))
+    return messages
+
+class FakeTmi(object):
+    """IRC server speaking the subset of Twitch's TMI used by the bot:
+    PASS, NICK, JOIN, PING/PONG and PRIVMSG, for a single connection.
+
+    Parameters
+    ----------
+    on_message : callable
+        Called as ``on_message(chan, text, now)`` for every chat message
+        the bot sends, with the :func:`time.perf_counter` time it was
+        read.
+    ping_interval : float, optional
+        Seconds between PINGs sent to the bot. The time to its PONG
+        shows how far behind the bot is in reading chat.
+
+    Attributes
+    ----------
+    nick : str or None
+        The nickname given by the bot.
+    joined : set of str
+        The channels the bot joined.
+    ping_rtts : list of float
+        Seconds from each PING to its PONG.
+    connected : :class:`asyncio.Event`
+        Set once the bot has connected.
+    """
+    def __init__(self, on_message, ping_interval=2.0):
+        self.on_message = on_message
+        self.ping_interval = ping_interval
+        self.nick = None
+        self.joined = set()
+        self.ping_rtts = []
+        self.connected = asyncio.Event()
+        self._writer = None
+        self._ping_sent = None
+
+    async def start(self, port, host="127.0.0.1"):
+        """Start listening; returns the :class:`asyncio.Server`."""
+        return await asyncio.start_server(self._handle, host, port)
+
+    def send(self, line):
+        """Send a line to the bot, if it is connected."""
+        if self._writer is not None:
+            self._writer.write(f"{line}\r\n".encode("utf-8"))
+
+    async def drain(self):
+        """Wait until the bot has taken the buffered lines."""
+        if self._writer is not None:
+            await self._writer.drain()
+
+    def privmsg(self, chan, username, message):
+        """Send a chat message of a user in a channel to the bot."""
+        self.send(f":{username}!{username}@{username}.tmi.twitch.tv "
+                  f"PRIVMSG {chan} :{message}")
+
+    async def _handle(self, reader, writer):
+        self._writer = writer
+        self.connected.set()
+        pinger = asyncio.create_task(self._ping())
+        try:
+            async for lines in irc.read_lines(reader):
+                now = time.perf_counter()
+                for line in lines:
+                    self._command(line, now)
+        except ConnectionError:
+            pass
+        finally:
+            pinger.cancel()
+            self._writer = None
+            writer.close()
+
+    def _command(self, line, now):
+        if line.startswith(":"):
+            line = line.partition(" ")[2]
+        command, _, params = line.partition(" ")
+        if command == "NICK":
+            self.nick = params
+            self.send(f":tmi.twitch.tv 001 {params} :Welcome, GLHF!")
+        elif command == "JOIN":
+            for chan in params.split(","):
+                self.joined.add(chan)
+                self.send(f":{self.nick}!{self.nick}@{self.nick}"
+                          f".tmi.twitch.tv JOIN {chan}")
+        elif command == "PING":
+            self.send(f"PONG {params}")
+        elif command == "PONG" and self._ping_sent is not None:
+            self.ping_rtts.append(now - self._ping_sent)
+            self._ping_sent = None
+        elif command == "PRIVMSG":
+            chan, _, text = params.partition(" :")
+            self.on_message(chan, text.strip(), now)
+
+    async def _ping(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            if self._ping_sent is None:
+                self._ping_sent = time.perf_counter()
+                self.send("PING :tmi.twitch.tv")
+
+class LoadGenerator(object):
+    """Chat traffic for running trivia sessions, with correct answers,
+    near misses and noise, and the bot's responses to it.
+
+    Parameters
+    ----------
+    server : :class:`FakeTmi`
+        The server to send the chat through.
+    channels : list of str
+        The channels to chat in.
+    questions : dict
+        Maps each question of the trivia set to its answer.
+    mix : (float, float, float)
+        Shares of correct answers, near misses and noise. Correct
+        answers and near misses are only sent while a question is open
+        in the channel; otherwise noise is sent instead.
+    replay : list of (str or None, str), optional
+        Recorded chat replayed in order as the noise, see
+        :func:`load_replay`. Synthetic chatter is used if empty.
+    seed : int, optional
+        Seed for the random generator, so runs are reproducible.
+
+    Attributes
+    ----------
+    stats : :class:`collections.Counter`
+        Lines sent of each kind, questions answered and skipped,
+        answers accepted from near misses, sessions started.
+    latencies : list of float
+        Seconds from the first correct answer to a question to the
+        bot's message that it was answered.
+    asked : dict
+        Maps a channel to [answer, question number, time the first
+        correct answer was sent or None] while a question is open.
+    """
+    def __init__(self, server, channels, questions, mix, replay=(),
+                 seed=0):
+        self.server = server
+        self.channels = channels
+        self.questions = questions
+        self.mix = mix
+        self.replay = list(replay)
+        self.stats = collections.Counter()
+        self.latencies = []
+        self.asked = {}
+        self._rng = random.Random(seed)
+        self._replayed = 0
+
+    def start(self, chan):
+        """Start a trivia session in a channel."""
+        self.server.privmsg(chan, "loadadmin", "!triviastart")
+        self.stats["sessions"] += 1
+        self.stats["sent"] += 1
+
+    def on_message(self, chan, text, now):
+        """Follow the game from the messages of the bot."""
+        match = QUESTION.match(text)
+        if match is not None:
+            self.asked[chan] = [self.questions.get(match.group(2)),
+                                int(match.group(1)), None]
+            return
+        match = ANSWERED.match(text)
+        if match is not None:
+            question = self.asked.pop(chan, None)
+            if question is None or question[2] is None:
+                return
+            self.latencies.append(now - question[2])
+            if match.group(1).startswith("guesser"):
+                self.stats["false_accepts"] += 1
+            self.stats["answered"] += 1
+        elif text.startswith("Question was not answered in time"):
+            question = self.asked.pop(chan, None)
+            self.stats["skipped"] += 1
+            if question is not None and question[2] is not None:
+                self.stats["missed"] += 1
+        elif text.startswith("Thanks for playing"):
+            self.start(chan)
+
+    async def run(self, rate, duration, tick=0.01):
+        """Send chat at `rate` lines per second for `duration` seconds.
+
+        Returns
+        -------
+        float
+            The seconds taken, longer than `duration` if the bot could
+            not keep up with the rate.
+        """
+        started = time.perf_counter()
+        sent = 0
+        while True:
+            elapsed = time.perf_counter() - started
+            if elapsed >= duration:
+                break
+            due = int(elapsed * rate) - sent
+            for _ in range(due):
+                self._send_one()
+            sent += due
+            await self.server.drain()
+            await asyncio.sleep(tick)
+        await self.server.drain()
+        return time.perf_counter() - started
+
+    def _send_one(self):
+        rng = self._rng
+        chan = rng.choice(self.channels)
+        kind = rng.choices(("correct", "near", "noise"), self.mix)[0]
+        question = self.asked.get(chan)
+        if question is None or question[0] is None:
+            kind = "noise"
+        if kind == "noise":
+            username, message = self._noise()
+        else:
+            answer = question[0]
+            chars = list(answer)
+            if kind == "correct":
+                username = f"solver{rng.randrange(100)}"
+                # half of the correct answers have a typo
+                if rng.random() < 0.5:
+                    chars[rng.randrange(len(chars))] = "x"
+                if question[2] is None:
+                    question[2] = time.perf_counter()
+            else:
+                username = f"guesser{rng.randrange(100)}"
+                # wrong in more than half of the letters
+                for index in rng.sample(range(len(chars)),
+                                        len(chars) // 2 + 1):
+                    chars[index] = chr((ord(chars[index]) - 96) % 26 + 97)
+            message = "".join(chars)
+        self.server.privmsg(chan, username, message)
+        self.stats[kind] += 1
+        self.stats["sent"] += 1
+
+    def _noise(self):
+        rng = self._rng
+        if self.replay:
+            username, message = self.replay[self._replayed
+                                            % len(self.replay)]
+            self._replayed += 1
+            return username or f"viewer{rng.randrange(5000)}", message
+        return (f"viewer{rng.randrange(5000)}",
+                " ".join(rng.choices(NOISE, k=rng.randint(1, 6))))
+
+async def scrape(port, name):
+    """Read the value of an unlabelled metric from the bot's metrics
+    endpoint, or None if it cannot be read.
+    """
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET / HTTP/1.0\r\n\r\n")
+        body = (await reader.read()).decode("utf-8")
+        writer.close()
+    except OSError:
+        return None
+    for line in body.splitlines():
+        if line.startswith(f"{name} "):
+            return float(line.split()[1])
+    return None
+
+async def wait_for(condition, timeout, what):
+    """Poll `condition` until it is true, or fail after `timeout`."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise SystemExit(f"Timed out waiting for {what}")
+        await asyncio.sleep(0.05)
+
+async def loadtest(args):
+    channels = [f"#load{number}" for number in range(args.channels)]
+    replay = load_replay(args.replay) if args.replay else ()
+    with tempfile.TemporaryDirectory() as directory:
+        questions = make_set(os.path.join(directory, "triviaset.csv"),
+                             args.questions)
+        with open(os.path.join(directory, "config.txt"), "w") as fp:
+            fp.write(CONFIG.format(
+                num_qs=args.questions, port=args.port,
+                channels=",".join(channels),
+                metrics_port=args.port + 1 if not args.no_bot else 0))
+        generator = None
+        server = FakeTmi(lambda *message: generator.on_message(*message))
+        generator = LoadGenerator(server, channels, questions, args.mix,
+                                  replay, args.seed)
+        listener = await server.start(args.port)
+        bot = None
+        if not args.no_bot:
+            log = open(os.path.join(directory, "bot.log"), "w")
+            bot = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.join(REPO, "twitchtriviabot.py"),
+                cwd=directory, stdout=log, stderr=log)
+        try:
+            await wait_for(lambda: server.joined.issuperset(channels), 60,
+                           "the bot to join")
+            for chan in channels:
+                generator.start(chan)
+            await wait_for(lambda: len(generator.asked) == len(channels),
+                           60, "the first questions")
+            elapsed = await generator.run(args.rate, args.duration)
+            # let the bot work through what it has been sent
+            await asyncio.sleep(args.settle)
+            read = None
+            if bot is not None:
+                read = await scrape(args.port + 1, "ttb_chat_lines_total")
+        finally:
+            if bot is not None and bot.returncode is None:
+                bot.send_signal(signal.SIGTERM)
+                try:
+                    await asyncio.wait_for(bot.wait(), 10)
+                except asyncio.TimeoutError:
+                    bot.kill()
+                log.close()
+            listener.close()
+
+    stats = generator.stats
+    report = {
+        "params": {"rate": args.rate, "duration": args.duration,
+                   "channels": args.channels, "mix": list(args.mix),
+                   "replay": args.replay},
+        "sent": stats["sent"],
+        "sent_by_kind": {kind: stats[kind]
+                         for kind in ("correct", "near", "noise")},
+        "seconds": elapsed,
+        "rate": stats["sent"] / elapsed,
+        "read": read,
+        "dropped": None if read is None else stats["sent"] - int(read),
+        "answered": stats["answered"],
+        "skipped": stats["skipped"],
+        "missed": stats["missed"],
+        "false_accepts": stats["false_accepts"],
+        "answer_latency": {f"p{int(q * 100)}": percentile(
+            generator.latencies, q) for q in (0.5, 0.9, 0.99, 1.0)},
+        "ping_rtt": {f"p{int(q * 100)}": percentile(server.ping_rtts, q)
+                     for q in (0.5, 0.99, 1.0)},
+    }
+    return report
+
+def parse_mix(text):
+    mix = tuple(float(share) for share in text.split(","))
+    if len(mix) != 3 or any(share < 0 for share in mix) or not sum(mix):
+        raise argparse.ArgumentTypeError(
+            "expected three shares: correct,near,noise")
+    return mix
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.loadtest",
+        description="Run the bot against a fake Twitch chat under load.")
+    parser.add_argument("--rate", type=float, default=1000,
+                        help="chat lines per second (default 1000)")
+    parser.add_argument("--duration", type=float, default=30,
+                        help="seconds of chat (default 30)")
+    parser.add_argument("--channels", type=int, default=4,
+                        help="number of channels (default 4)")
+    parser.add_argument("--mix", type=parse_mix, default=(0.01, 0.1, 0.89),
+                        help="shares of correct answers, near misses and "
+                        "noise (default 0.01,0.1,0.89)")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="recorded chat to replay as the noise")
+    parser.add_argument("--questions", type=int, default=1000,
+                        help="questions in the trivia set (default 1000)")
+    parser.add_argument("--port", type=int, default=16667,
+                        help="port of the fake server; the bot's metrics "
+                        "use the next one (default 16667)")
+    parser.add_argument("--settle", type=float, default=3,
+                        help="seconds to wait for the bot after the chat "
+                        "(default 3)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-bot", action="store_true",
+                        help="do not start the bot, wait for one")
+    parser.add_argument("--json", metavar="FILE",
+                        help="write the report to FILE")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(loadtest(args))
+    ms = lambda value: "-" if value is None else f"{value * 1e3:.1f}"
+    print(f"Sent {report['sent']} lines in {report['seconds']:.1f}s "
+          f"({report['rate']:.0f}/s): {report['sent_by_kind']}")
+    if report["read"] is not None:
+        print(f"Bot read {report['read']:.0f} lines, "
+              f"{report['dropped']} dropped")
+    print(f"Questions answered {report['answered']}, skipped "
+          f"{report['skipped']} ({report['missed']} despite a correct "
+          f"answer), near misses accepted {report['false_accepts']}")
+    print("Answer latency ms: " + " ".join(
+        f"{q}={ms(value)}" for q, value in report["answer_latency"].items()))
+    print("PING round trip ms: " + " ".join(
+        f"{q}={ms(value)}" for q, value in report["ping_rtt"].items()))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fp:
+            json.dump(report, fp, indent=1)
+
+if __name__ == "__main__":
+    main()
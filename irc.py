@@ -0,0 +1,333 @@
+"""
+.. module:: irc
+   :synopsis: Helpers for the Twitch IRC connection.
+"""
+import asyncio
+import collections
+import heapq
+
+#: Priority of the messages that run the game (questions, hints, ...)
+GAME = 0
+#: Priority of replies to chat commands
+REPLY = 1
+
+async def read_lines(reader, size=4096):
+    """Read CRLF-terminated IRC lines from a stream.
+
+    A single read may carry many lines, and a line split across two
+    reads is held back until the rest of it arrives.
+
+    Parameters
+    ----------
+    reader : :class:`asyncio.StreamReader`
+        The stream connected to the IRC server.
+    size : int, optional
+        The maximum number of bytes requested per read.
+
+    Yields
+    ------
+    list of str
+        The complete lines received by one read, without the line
+        terminators.
+    """
+    buffer = b""
+    while True:
+        data = await reader.read(size)
+        if not data:
+            return
+        *lines, buffer = (buffer + data).split(b"\r\n")
+        if lines:
+            yield [line.decode("utf-8", errors="replace") for line in lines]
+
+#: Escaped characters in IRCv3 tag values
+TAG_ESCAPES = {":": ";", "s": " ", "r": "\r", "n": "\n", "\\": "\\"}
+
+def unescape_tag(value):
+    """Undo the escaping of an IRCv3 tag value, e.g. "a\\sb" to "a b".
+    """
+    chars = []
+    escaped = False
+    for char in value:
+        if escaped:
+            chars.append(TAG_ESCAPES.get(char, char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        else:
+            chars.append(char)
+    return "".join(chars)
+
+class Message(object):
+    """An IRC line split into its parts, e.g. for the line::
+
+        @badges=;color= :nick!nick@nick.tmi.twitch.tv PRIVMSG #chan :hi
+
+    Parameters
+    ----------
+    raw_tags : str or None
+        The IRCv3 tags without the leading "@", parsed when first used.
+    prefix : str or None
+        The source of the message, e.g. "nick!nick@nick.tmi.twitch.tv".
+    command : str
+        The command, e.g. "PRIVMSG", "JOIN" or "001".
+    params : list of str
+        The parameters, the last of which may contain spaces.
+
+    Attributes
+    ----------
+    prefix : str or None
+        The source of the message.
+    command : str
+        The command.
+    params : list of str
+        The parameters.
+    _tags : str or dict or None
+        The tags, as received or once parsed.
+    """
+    __slots__ = ("_tags", "prefix", "command", "params")
+
+    def __init__(self, raw_tags, prefix, command, params):
+        self._tags = raw_tags
+        self.prefix = prefix
+        self.command = command
+        self.params = params
+
+    @classmethod
+    def parse(cls, line):
+        """Split an IRC line in a single pass.
+
+        Parameters
+        ----------
+        line : str
+            The line without its terminator.
+
+        Returns
+        -------
+        :class:`Message`
+            The message. Lines without a command give an empty command.
+        """
+        raw_tags = prefix = None
+        if line.startswith("@"):
+            raw_tags, _, line = line[1:].partition(" ")
+        if line.startswith(":"):
+            prefix, _, line = line[1:].partition(" ")
+        command, _, line = line.partition(" ")
+        if line.startswith(":"):
+            # only a trailing parameter, e.g. "PING :tmi.twitch.tv"
+            params = [line[1:]]
+        else:
+            line, colon, trailing = line.partition(" :")
+            params = line.split()
+            if colon:
+                params.append(trailing)
+        return cls(raw_tags, prefix, command, params)
+
+    @property
+    def nick(self):
+        """str or None: The nickname of the sending user, None for
+        messages from the server.
+        """
+        if self.prefix is None or "!" not in self.prefix:
+            return None
+        return self.prefix.partition("!")[0]
+
+    @property
+    def channel(self):
+        """str or None: The channel of the message, e.g. "#chan"."""
+        if self.params and self.params[0].startswith("#"):
+            return self.params[0]
+        return None
+
+    @property
+    def trailing(self):
+        """str: The last parameter, e.g. the text of a chat message."""
+        return self.params[-1] if self.params else ""
+
+    @property
+    def tags(self):
+        """dict: The IRCv3 tags, e.g. {"display-name": "Nick"}."""
+        if self._tags is None:
+            self._tags = {}
+        elif isinstance(self._tags, str):
+            tags = {}
+            for tag in self._tags.split(";"):
+                key, _, value = tag.partition("=")
+                tags[key] = unescape_tag(value) if "\\" in value else value
+            self._tags = tags
+        return self._tags
+
+class RateLimiter(object):
+    """Limit on the number of events in any window of `period` seconds,
+    such as Twitch's limit on chat messages per 30 seconds.
+
+    This is a token bucket of `limit` tokens in which each token comes
+    back exactly `period` seconds after it was spent, so that bursts
+    use the whole budget but no window ever holds more than `limit`
+    events.
+
+    Parameters
+    ----------
+    limit : int
+        The maximum number of events per window.
+    period : float
+        The length of the window in seconds.
+
+    Attributes
+    ----------
+    limit : int
+        The maximum number of events per window.
+    period : float
+        The length of the window in seconds.
+    _spent : :class:`collections.deque` of float
+        The times of the events in the current window.
+    """
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self._spent = collections.deque()
+
+    def delay(self, now, limit=None):
+        """Time until the next event is allowed.
+
+        Parameters
+        ----------
+        now : float
+            The current time in seconds.
+        limit : int, optional
+            A lower limit to apply instead of :attr:`limit`, so that
+            some of the budget is kept for other events.
+
+        Returns
+        -------
+        float
+            The number of seconds to wait, 0 if an event is allowed now.
+        """
+        if limit is None:
+            limit = self.limit
+        spent = self._spent
+        while spent and spent[0] <= now - self.period:
+            spent.popleft()
+        if len(spent) < limit:
+            return 0.0
+        return spent[-limit] + self.period - now
+
+    def spend(self, now):
+        """Record an event.
+
+        Parameters
+        ----------
+        now : float
+            The current time in seconds.
+        """
+        self._spent.append(now)
+
+class SendQueue(object):
+    """Outbound chat messages, sent as fast as a :class:`RateLimiter`
+    allows.
+
+    Messages are sent by priority and then in the order they were
+    queued, so game messages overtake pending command replies. Replies
+    may only use :attr:`REPLY_SHARE` of the budget, which keeps the
+    rest free for game messages. A reply which is already waiting to
+    be sent is not queued a second time.
+
+    Parameters
+    ----------
+    write : callable
+        Sends one line to the server.
+    limit : int, optional
+        The maximum number of messages per `period`.
+    period : float, optional
+        The length of the rate limit window in seconds.
+
+    Attributes
+    ----------
+    limiter : :class:`RateLimiter`
+        The rate limit.
+    stats : :class:`collections.Counter`
+        Number of messages "sent" and of replies "coalesced" with a
+        pending one.
+    _write : callable
+        Sends one line to the server.
+    _heap : list of (int, int, str)
+        Priority, sequence number and line of each pending message.
+    _replies : set of str
+        The pending replies.
+    _count : int
+        Sequence number of the next message.
+    _pending : :class:`asyncio.Event`
+        Set while there are pending messages.
+    _wake : :class:`asyncio.Event`
+        Set when a message is queued.
+    _empty : :class:`asyncio.Event`
+        Set while there are no pending messages.
+    """
+    #: Share of the rate limit that replies may use
+    REPLY_SHARE = 0.75
+
+    def __init__(self, write, limit=20, period=30.0):
+        self.limiter = RateLimiter(limit, period)
+        self.stats = collections.Counter()
+        self._write = write
+        self._heap = []
+        self._replies = set()
+        self._count = 0
+        self._pending = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._empty = asyncio.Event()
+        self._empty.set()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def put(self, line, priority=GAME):
+        """Queue a line to be sent.
+
+        Parameters
+        ----------
+        line : str
+            The line, without the line terminator.
+        priority : int, optional
+            :data:`GAME` or :data:`REPLY`.
+        """
+        if priority == REPLY:
+            if line in self._replies:
+                self.stats["coalesced"] += 1
+                return
+            self._replies.add(line)
+        heapq.heappush(self._heap, (priority, self._count, line))
+        self._count += 1
+        self._pending.set()
+        self._wake.set()
+        self._empty.clear()
+
+    async def run(self):
+        """Send the queued lines until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._pending.wait()
+            limit = None
+            if self._heap[0][0] == REPLY:
+                limit = max(1, int(self.limiter.limit * self.REPLY_SHARE))
+            wait = self.limiter.delay(loop.time(), limit)
+            if wait > 0:
+                # a game message queued meanwhile may be sent earlier
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            priority, _, line = heapq.heappop(self._heap)
+            if priority == REPLY:
+                self._replies.discard(line)
+            if not self._heap:
+                self._pending.clear()
+                self._empty.set()
+            self.limiter.spend(loop.time())
+            self._write(line)
+            self.stats["sent"] += 1
+
+    async def join(self):
+        """Wait until all queued lines have been sent."""
+        await self._empty.wait()
@@ -0,0 +1,149 @@
+"""
+.. module:: matcher
+   :synopsis: Matching chat messages against trivia answers.
+"""
+import collections
+import math
+
+from editdistance import DistanceAlgorithm, EditDistance
+
+def normalize(text):
+    """Normalize an answer or a chat message for comparison.
+
+    Parameters
+    ----------
+    text : str
+        The text to normalize.
+
+    Returns
+    -------
+    str
+        `text` without surrounding whitespace and in lowercase.
+    """
+    return text.strip().lower()
+
+def tolerance(hint_req):
+    """Maximum relative distance (distance / answer length) for a
+    message to be accepted.
+
+    Parameters
+    ----------
+    hint_req : int
+        Number of hints given so far. Every hint makes the matching
+        stricter.
+
+    Returns
+    -------
+    float
+        The tolerance.
+    """
+    return 0.4 - 0.15 * hint_req
+
+class AnswerMatcher(object):
+    """Matcher for the answers of a single question, built once when
+    the question is asked.
+
+    Parameters
+    ----------
+    answers : iterable
+        The accepted answers. Entries which are not strings (e.g. NaN
+        for a blank "Answer 2" cell) or which are blank are ignored.
+    algorithm : :class:`DistanceAlgorithm`, optional
+        The distance algorithm to use.
+    max_hints : int, optional
+        The number of hints that can be given for a question.
+
+    Attributes
+    ----------
+    stats : :class:`collections.Counter`
+        Number of messages resolved by each tier of :meth:`match`:
+        "exact" (accepted by lookup), "length" (rejected as every
+        answer is too short or too long), "distance_match" and
+        "distance_miss" (resolved by the distance kernel).
+    _variants : list of (str, int, tuple of int, :class:`EditDistance`)
+        The normalized answers with their length, the maximum accepted
+        distance for each hint level and a comparer of their own (so
+        that per-string caches in the comparer are not shared).
+    _exact : frozenset of str
+        The normalized answers, for exact matches.
+    """
+    def __init__(self, answers,
+                 algorithm=DistanceAlgorithm.DAMERAUOSA_BITPARALLEL,
+                 max_hints=2):
+        self._variants = []
+        for answer in answers:
+            if not isinstance(answer, str) or not normalize(answer):
+                continue
+            answer = normalize(answer)
+            length = len(answer)
+            caps = tuple(self._max_distance(length, tolerance(hint_req))
+                         for hint_req in range(max_hints + 1))
+            self._variants.append((answer, length, caps,
+                                   EditDistance(algorithm)))
+        self._exact = frozenset(variant[0] for variant in self._variants)
+        self.stats = collections.Counter()
+
+    @staticmethod
+    def _max_distance(length, tol):
+        """Largest distance `dist` such that ``dist / length < tol``."""
+        dist = math.ceil(tol * length)
+        while dist >= 0 and not dist / length < tol:
+            dist -= 1
+        return dist
+
+    def match(self, message, hint_req=0):
+        """Check if a chat message matches any of the answers.
+
+        Parameters
+        ----------
+        message : str
+            The chat message.
+        hint_req : int, optional
+            Number of hints given so far.
+
+        Returns
+        -------
+        bool
+            True if the message is within tolerance of an answer.
+        """
+        return self.match_first((message,), hint_req) == 0
+
+    def match_first(self, messages, hint_req=0):
+        """Find the first of a burst of chat messages that matches any
+        of the answers. Messages after it are not evaluated.
+
+        Parameters
+        ----------
+        messages : iterable of str
+            The chat messages, in arrival order.
+        hint_req : int, optional
+            Number of hints given so far.
+
+        Returns
+        -------
+        int
+            The index of the first matching message, or -1 if none of
+            them match.
+        """
+        exact = self._exact
+        variants = [(answer, answer_length, caps[hint_req], comparer)
+                    for answer, answer_length, caps, comparer
+                    in self._variants]
+        stats = self.stats
+        for index, message in enumerate(messages):
+            message = normalize(message)
+            if message in exact:
+                stats["exact"] += 1
+                return index
+            length = len(message)
+            compared = False
+            for answer, answer_length, max_distance, comparer in variants:
+                # the distance is at least the difference in length
+                if abs(length - answer_length) > max_distance:
+                    continue
+                compared = True
+                if comparer.compare(answer, message, max_distance) >= 0:
+                    stats["distance_match"] += 1
+                    return index
+            stats["distance_miss" if compared else "length"] += 1
+        return -1
@@ -0,0 +1,308 @@
+"""
+.. module:: metrics
+   :synopsis: Lightweight counters, gauges and histograms, exposed in
+              the Prometheus text format.
+"""
+import asyncio
+import bisect
+
+class Metric(object):
+    """A named measurement with an optional label.
+
+    Parameters
+    ----------
+    name : str
+        The metric name, e.g. "ttb_chat_lines_total".
+    help_text : str
+        One line describing the metric.
+    label : str, optional
+        Name of the label that splits the metric into series.
+    function : callable, optional
+        Returns the current value when the metric is rendered, instead
+        of a value kept by the metric. Only for unlabelled metrics.
+
+    Attributes
+    ----------
+    name : str
+        The metric name.
+    help_text : str
+        One line describing the metric.
+    label : str or None
+        Name of the label.
+    _values : dict
+        Maps a label value (None if there is no label) to the value of
+        the series.
+    _function : callable or None
+        Returns the current value.
+    """
+    TYPE = "untyped"
+
+    def __init__(self, name, help_text, label=None, function=None):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+        self._function = function
+
+    def value(self, label_value=None):
+        """Return the value of a series.
+
+        Parameters
+        ----------
+        label_value : str, optional
+            The label value of the series.
+
+        Returns
+        -------
+        float
+            The value, 0 for a series that was never updated.
+        """
+        if self._function is not None:
+            return self._function()
+        return self._values.get(label_value, 0)
+
+    def render(self):
+        """Return the metric in the Prometheus text format.
+
+        Returns
+        -------
+        list of str
+            The lines.
+        """
+        lines = [f"# HELP {self.name} {self.help_text}",
+                 f"# TYPE {self.name} {self.TYPE}"]
+        if self._function is not None or not self._values:
+            lines.append(f"{self.name} {self.value()}")
+        for label_value, value in sorted(self._values.items(),
+                                         key=lambda item: str(item[0])):
+            lines.append(f"{self.name}{self._labels(label_value)} {value}")
+        return lines
+
+    def _labels(self, label_value, **extra):
+        labels = dict(extra)
+        if self.label is not None and label_value is not None:
+            labels = {self.label: label_value, **labels}
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"'
+                              for key, value in labels.items()) + "}"
+
+class Counter(Metric):
+    """A value that only goes up, e.g. the number of lines read."""
+    TYPE = "counter"
+
+    def inc(self, amount=1, label_value=None):
+        """Add to the counter.
+
+        Parameters
+        ----------
+        amount : int or float, optional
+            The amount to add.
+        label_value : str, optional
+            The label value of the series.
+        """
+        values = self._values
+        values[label_value] = values.get(label_value, 0) + amount
+
+class Gauge(Metric):
+    """A value that goes up and down, e.g. the length of a queue."""
+    TYPE = "gauge"
+
+    def set(self, value, label_value=None):
+        """Set the gauge.
+
+        Parameters
+        ----------
+        value : int or float
+            The value.
+        label_value : str, optional
+            The label value of the series.
+        """
+        self._values[label_value] = value
+
+class Histogram(Metric):
+    """The distribution of observed values, e.g. latencies, counted in
+    fixed buckets.
+
+    Parameters
+    ----------
+    name : str
+        The metric name.
+    help_text : str
+        One line describing the metric.
+    buckets : sequence of float
+        Upper bounds of the buckets, in ascending order.
+
+    Attributes
+    ----------
+    buckets : tuple of float
+        Upper bounds of the buckets.
+    count : int
+        Number of observations.
+    sum : float
+        Sum of the observations.
+    _counts : list of int
+        Number of observations in each bucket, with one more bucket for
+        values above the last bound.
+    """
+    TYPE = "histogram"
+
+    def __init__(self, name, help_text, buckets):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value):
+        """Record an observation.
+
+        Parameters
+        ----------
+        value : float
+            The observed value.
+        """
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of its bucket.
+
+        Parameters
+        ----------
+        q : float
+            The quantile, between 0 and 1.
+
+        Returns
+        -------
+        float
+            The estimate; infinity if it is above the last bound, 0 if
+            nothing was observed.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self._counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}",
+                 f"# TYPE {self.name} {self.TYPE}"]
+        seen = 0
+        for bound, count in zip(self.buckets, self._counts):
+            seen += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {seen}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+#: Buckets for latencies of in-process work, in seconds
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+#: Buckets for the time players take, in seconds
+SLOW_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120)
+
+class Registry(object):
+    """A set of metrics that are rendered together.
+
+    Attributes
+    ----------
+    metrics : list of :class:`Metric`
+        The metrics, in the order they were created.
+    """
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, label=None, function=None):
+        """Create and register a :class:`Counter`."""
+        return self._register(Counter(name, help_text, label, function))
+
+    def gauge(self, name, help_text, label=None, function=None):
+        """Create and register a :class:`Gauge`."""
+        return self._register(Gauge(name, help_text, label, function))
+
+    def histogram(self, name, help_text, buckets=FAST_BUCKETS):
+        """Create and register a :class:`Histogram`."""
+        return self._register(Histogram(name, help_text, buckets))
+
+    def render(self):
+        """Return all metrics in the Prometheus text format.
+
+        Returns
+        -------
+        str
+            The metrics.
+        """
+        return "".join(f"{line}\n" for metric in self.metrics
+                       for line in metric.render())
+
+    def summary(self):
+        """Return a one-line summary of all metrics, for logs.
+
+        Histograms are summarised by their count and the estimated
+        median and 99th percentile.
+
+        Returns
+        -------
+        str
+            The summary.
+        """
+        parts = []
+        for metric in self.metrics:
+            if isinstance(metric, Histogram):
+                parts.append(f"{metric.name}: n={metric.count} "
+                             f"p50<={metric.quantile(0.5)} "
+                             f"p99<={metric.quantile(0.99)}")
+            elif metric.label is None:
+                parts.append(f"{metric.name}={metric.value()}")
+            else:
+                parts.append(f"{metric.name}=" + ",".join(
+                    f"{label_value}:{value}" for label_value, value
+                    in sorted(metric._values.items(),
+                              key=lambda item: str(item[0]))))
+        return " | ".join(parts)
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+async def start_server(registry, port, host="127.0.0.1"):
+    """Serve the metrics of a registry over HTTP, for Prometheus or
+    ``curl``. Any request gets the metrics as the response.
+
+    Parameters
+    ----------
+    registry : :class:`Registry`
+        The metrics to serve.
+    port : int
+        The port to listen on.
+    host : str, optional
+        The address to listen on; local only by default.
+
+    Returns
+    -------
+    :class:`asyncio.Server`
+        The server.
+    """
+    async def handle(reader, writer):
+        try:
+            # the request itself does not matter
+            await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+            body = registry.render().encode("utf-8")
+            writer.write(b"HTTP/1.0 200 OK\r\n"
+                         b"Content-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: %d\r\n\r\n" % len(body) + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
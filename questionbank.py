@@ -0,0 +1,447 @@
+"""
+.. module:: questionbank
+   :synopsis: Loading and sampling trivia questions.
+"""
+import array
+import csv
+import hashlib
+import mmap
+import os
+import random
+import struct
+import sys
+import types
+
+class Question(object):
+    """A single trivia question.
+
+    Parameters
+    ----------
+    category : str
+        The topic/game of the question.
+    question : str
+        The question text.
+    answers : tuple of str
+        The "Answer" and "Answer 2" columns; a blank cell is None.
+    creator : str, optional
+        Who submitted the question.
+    """
+    __slots__ = ("category", "question", "answers", "creator")
+
+    def __init__(self, category, question, answers, creator=None):
+        self.category = category
+        self.question = question
+        self.answers = answers
+        self.creator = creator
+
+    @classmethod
+    def from_row(cls, row):
+        """Create a question from the cells of one trivia set row, in
+        the order Topic/Game, Question, Answer, Answer 2, Creator.
+
+        Parameters
+        ----------
+        row : sequence
+            The cells of the row. Blank cells may be empty strings,
+            None or NaN.
+
+        Returns
+        -------
+        :class:`Question` or None
+            The question, or None if the row has no question or no
+            answer.
+        """
+        cells = [cell if isinstance(cell, str) and cell.strip() else None
+                 for cell in row[: 5]]
+        cells.extend([None] * (5 - len(cells)))
+        category, question, answer_1, answer_2, creator = cells
+        if question is None or answer_1 is None:
+            return None
+        if category is not None:
+            # categories repeat a lot, so share a single copy
+            category = sys.intern(category)
+        return cls(category, question, (answer_1, answer_2), creator)
+
+class QuestionBank(object):
+    """All questions of a trivia set, held as :class:`Question` records
+    in a plain list.
+
+    Parameters
+    ----------
+    questions : list of :class:`Question`
+        The questions.
+
+    Attributes
+    ----------
+    _questions : list of :class:`Question`
+        The questions.
+    """
+    def __init__(self, questions):
+        self._questions = questions
+
+    def __len__(self):
+        return len(self._questions)
+
+    def __getitem__(self, index):
+        return self._questions[index]
+
+    def sample(self, count):
+        """Draw distinct questions at random.
+
+        Parameters
+        ----------
+        count : int
+            The number of questions to draw.
+
+        Returns
+        -------
+        list of :class:`Question`
+            The questions, in random order.
+        """
+        return random.sample(self._questions, count)
+
+    def close(self):
+        """Nothing to release; for the same interface as
+        :class:`MappedBank`.
+        """
+
+#: magic, modification time (ns), size and SHA-1 of the source file,
+#: number of questions
+CACHE_HEADER = struct.Struct("<8sQQ20s4xQ")
+
+def _file_digest(path):
+    """SHA-1 of the contents of a file."""
+    sha = hashlib.sha1()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.digest()
+
+def _open_cache(path, magic, stat, digest):
+    """Map a cache file if it was built from the current source file.
+
+    The cache is valid if the source file has the same size and the
+    same SHA-1. The modification time is recorded but not trusted: an
+    edit that keeps the size within the timestamp resolution, or a
+    tool that restores the old time, would otherwise serve stale
+    questions. Hashing costs one read of the source file per load,
+    which is small next to building the cache.
+
+    Parameters
+    ----------
+    path : str
+        Path of the cache file.
+    magic : bytes
+        Expected magic of the cache file.
+    stat : :class:`os.stat_result`
+        Status of the source file.
+    digest : callable
+        Returns the SHA-1 of the source file.
+
+    Returns
+    -------
+    (:class:`mmap.mmap`, int) or None
+        The cache file and its number of questions, or None if there
+        is no valid cache.
+    """
+    try:
+        with open(path, "rb") as fp:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mapped) >= CACHE_HEADER.size:
+        found, _, size, sha1, count = CACHE_HEADER.unpack_from(mapped)
+        if (found == magic and size == stat.st_size
+                and len(mapped) >= CACHE_HEADER.size + 16 * count
+                and sha1 == digest()):
+            return mapped, count
+    mapped.close()
+    return None
+
+def _save_cache(path, magic, stat, digest, offsets, rows=b""):
+    """Write a cache file atomically.
+
+    Parameters
+    ----------
+    path : str
+        Path of the cache file.
+    magic : bytes
+        Magic of the cache file.
+    stat : :class:`os.stat_result`
+        Status of the source file.
+    digest : bytes
+        SHA-1 of the source file.
+    offsets : :class:`array.array`
+        Start and end offsets of each question, interleaved.
+    rows : bytes, optional
+        Data to store after the offsets.
+
+    Returns
+    -------
+    bool
+        True if the cache was saved.
+    """
+    # several processes may build the same cache at once
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as fp:
+            fp.write(CACHE_HEADER.pack(magic, stat.st_mtime_ns, stat.st_size,
+                                       digest, len(offsets) // 2))
+            offsets.tofile(fp)
+            fp.write(rows)
+        os.replace(tmp_path, path)
+    except OSError:
+        return False
+    return True
+
+def _compile_cache(path, magic, stat, digest, rows):
+    """Write rows to a new cache file and map it.
+
+    Parameters
+    ----------
+    path : str
+        Path of the cache file.
+    magic : bytes
+        Magic of the cache file.
+    stat : :class:`os.stat_result`
+        Status of the source file.
+    digest : bytes
+        SHA-1 of the source file.
+    rows : list of bytes
+        The CSV-encoded rows, one per question.
+
+    Returns
+    -------
+    (:class:`mmap.mmap`, int) or None
+        The cache file and its number of questions, or None if it
+        could not be saved.
+    """
+    offsets = array.array("Q")
+    position = CACHE_HEADER.size + 16 * len(rows)
+    for row in rows:
+        offsets.extend((position, position + len(row)))
+        position += len(row)
+    if not _save_cache(path, magic, stat, digest, offsets, b"".join(rows)):
+        return None
+    return _open_cache(path, magic, stat, lambda: digest)
+
+def _cached_offsets(mapped, count):
+    """The offsets stored in a mapped cache file."""
+    return memoryview(mapped)[CACHE_HEADER.size:
+                              CACHE_HEADER.size + 16 * count].cast("Q")
+
+class MappedBank(object):
+    """Questions read on demand from CSV-encoded rows in a
+    memory-mapped file. Only the questions that are drawn for a session
+    are ever parsed and held in memory, however large the trivia set
+    is.
+
+    Parameters
+    ----------
+    data : :class:`mmap.mmap` or bytes
+        The rows.
+    offsets : memoryview or :class:`array.array`
+        Start and end offsets in `data` of each question, interleaved.
+    mappings : list of :class:`mmap.mmap`, optional
+        The memory-mapped files to release on :meth:`close`.
+
+    Attributes
+    ----------
+    _data : :class:`mmap.mmap` or bytes
+        The rows.
+    _offsets : memoryview or :class:`array.array`
+        Start and end offsets of each question, interleaved.
+    _mappings : list of :class:`mmap.mmap`
+        The memory-mapped files.
+    """
+    def __init__(self, data, offsets, mappings=()):
+        self._data = data
+        self._offsets = offsets
+        self._mappings = list(mappings)
+
+    def __len__(self):
+        return len(self._offsets) // 2
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError("question index out of range")
+        start = self._offsets[2 * index]
+        end = self._offsets[2 * index + 1]
+        row = next(csv.reader([self._data[start:end].decode("utf-8")]))
+        return Question.from_row(row)
+
+    def sample(self, count):
+        """Draw distinct questions at random.
+
+        Parameters
+        ----------
+        count : int
+            The number of questions to draw.
+
+        Returns
+        -------
+        list of :class:`Question`
+            The questions, in random order.
+        """
+        return [self[index] for index in random.sample(range(len(self)),
+                                                       count)]
+
+    def close(self):
+        """Release the memory-mapped files."""
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._offsets = array.array("Q")
+        self._data = b""
+        for mapped in self._mappings:
+            mapped.close()
+        self._mappings = []
+
+class IndexedCsvBank(MappedBank):
+    """All questions of a CSV trivia set, read on demand from a
+    memory-mapped copy of its usable rows.
+
+    The rows are compiled once into a cache file next to the CSV
+    (``<file>.cache``) together with their offsets, and later loads
+    map the cache until the CSV changes. The CSV itself is never
+    mapped: it is the file users edit, and editing a mapped file in
+    place would change or cut off the rows under a running session
+    (or, on Windows, fail to save). The cache is only ever replaced
+    by renaming a new file over it, which leaves existing mappings
+    intact.
+
+    Parameters
+    ----------
+    path : str
+        Path of the CSV file (UTF-8, with a header row).
+
+    Attributes
+    ----------
+    path : str
+        Path of the CSV file.
+    cache_path : str
+        Path of the cache file.
+    """
+    MAGIC = b"TTBIDX3\0"
+
+    def __init__(self, path):
+        self.path = path
+        self.cache_path = f"{path}.cache"
+        cached = _open_cache(self.cache_path, self.MAGIC, os.stat(path),
+                             lambda: _file_digest(path))
+        if cached is None:
+            with open(path, "rb") as fp:
+                stat = os.fstat(fp.fileno())
+                data = fp.read()
+            offsets = self._build_index(data)
+            rows = [data[start:end]
+                    for start, end in zip(offsets[::2], offsets[1::2])]
+            cached = _compile_cache(self.cache_path, self.MAGIC, stat,
+                                    hashlib.sha1(data).digest(), rows)
+            if cached is None:
+                # e.g. a read-only directory: keep the CSV in memory
+                super().__init__(data, offsets)
+                return
+        super().__init__(cached[0], _cached_offsets(*cached), [cached[0]])
+
+    @staticmethod
+    def _build_index(data):
+        """Find the start and end offsets of every row that has a
+        question and an answer.
+        """
+        offsets = array.array("Q")
+        size = len(data)
+        start = 0
+        end = 0
+        header = True
+        while end < size:
+            # a newline inside a quoted field does not end the row
+            quotes = 0
+            while True:
+                newline = data.find(b"\n", end)
+                line_end = size if newline < 0 else newline + 1
+                quotes += data[end:line_end].count(b'"')
+                end = line_end
+                if quotes % 2 == 0 or end >= size:
+                    break
+            if header:
+                header = False
+            else:
+                row = next(csv.reader([data[start:end].decode("utf-8")]),
+                           [])
+                if Question.from_row(row) is not None:
+                    offsets.extend((start, end))
+            start = end
+        return offsets
+
+EXCEL_MAGIC = b"TTBXLS1\0"
+
+def _load_excel(path):
+    """Load an Excel trivia set through its compiled cache.
+
+    Parsing a workbook is slow, so the usable rows are compiled once
+    into a cache file next to it (``<file>.cache``) holding the rows as
+    CSV with their offsets. Later loads map the cache instead, until
+    the workbook changes.
+
+    Parameters
+    ----------
+    path : str
+        Path of the Excel file.
+
+    Returns
+    -------
+    :class:`MappedBank` or :class:`QuestionBank`
+        The questions; a :class:`QuestionBank` if the cache could not
+        be saved.
+    """
+    cache_path = f"{path}.cache"
+    stat = os.stat(path)
+    digest = lambda: _file_digest(path)
+    cached = _open_cache(cache_path, EXCEL_MAGIC, stat, digest)
+    if cached is not None:
+        return MappedBank(cached[0], _cached_offsets(*cached), [cached[0]])
+
+    import pandas as pd
+
+    frame = pd.read_excel(path, dtype=str)
+    rows = (Question.from_row(row) for row in frame.itertuples(index=False))
+    questions = [row for row in rows if row is not None]
+    lines = []
+    writer = csv.writer(types.SimpleNamespace(write=lines.append))
+    for question in questions:
+        writer.writerow((question.category, question.question,
+                         *question.answers, question.creator))
+    cached = _compile_cache(cache_path, EXCEL_MAGIC, stat, digest(),
+                            [line.encode("utf-8") for line in lines])
+    if cached is not None:
+        return MappedBank(cached[0], _cached_offsets(*cached), [cached[0]])
+    return QuestionBank(questions)
+
+def load(filename, filetype):
+    """Load a trivia set. Rows without a question or an answer (e.g.
+    the blank rows of the template) are skipped.
+
+    Parameters
+    ----------
+    filename : str
+        The file name without extension.
+    filetype : str
+        "csv" (UTF-8), "xls" or "xlsx". Excel files need pandas
+        until their cache is built.
+
+    Returns
+    -------
+    :class:`MappedBank` or :class:`QuestionBank`
+        The questions.
+
+    Raises
+    ------
+    ValueError
+        If `filetype` is not supported.
+    """
+    path = f"{filename}.{filetype}"
+    if filetype == "csv":
+        return IndexedCsvBank(path)
+    if filetype in ("xlsx", "xls"):
+        return _load_excel(path)
+    raise ValueError(f"Unsupported trivia set type: {filetype}")
@@ -0,0 +1,611 @@
+"""
+.. module:: scorestore
+   :synopsis: Persistent storage of user scores.
+"""
+import hashlib
+import heapq
+import json
+import os
+import sqlite3
+
+SESSION = 0  #: Index of the session score
+OVERALL = 1  #: Index of the total trivia points
+MATCH = 2  #: Index of the total wins
+
+class AbstractScoreStore(object):
+    """An interface to load, update and persist user scores. Scores of
+    a user are [session, overall, wins] lists, indexed by
+    :data:`SESSION`, :data:`OVERALL` and :data:`MATCH`.
+    """
+    def load(self):
+        """Load the stored scores, creating an empty store if there is
+        none.
+
+        Returns
+        -------
+        bool
+            True if an existing store was loaded.
+
+        Raises
+        ------
+        NotImplementedError
+            If called from abstract class instead of concrete class
+        """
+        raise NotImplementedError("Should have implemented this")
+
+    def get(self, username):
+        """Return the scores of a user.
+
+        Parameters
+        ----------
+        username : str
+            The user.
+
+        Returns
+        -------
+        list of int
+            The [session, overall, wins] scores of the user.
+
+        Raises
+        ------
+        KeyError
+            If the user has no scores.
+        NotImplementedError
+            If called from abstract class instead of concrete class
+        """
+        raise NotImplementedError("Should have implemented this")
+
+    def add(self, username, index, value):
+        """Add `value` to one of the scores of a user, creating the
+        user if needed.
+
+        Parameters
+        ----------
+        username : str
+            The user.
+        index : int
+            :data:`SESSION`, :data:`OVERALL` or :data:`MATCH`.
+        value : int
+            The points to add.
+
+        Raises
+        ------
+        NotImplementedError
+            If called from abstract class instead of concrete class
+        """
+        raise NotImplementedError("Should have implemented this")
+
+    def clear_session(self):
+        """Reset the session score of every user.
+
+        Raises
+        ------
+        NotImplementedError
+            If called from abstract class instead of concrete class
+        """
+        raise NotImplementedError("Should have implemented this")
+
+    def top_session(self, count):
+        """Return the users with the highest session scores.
+
+        Parameters
+        ----------
+        count : int
+            The maximum number of users to return.
+
+        Returns
+        -------
+        list of [str, int]
+            [username, session] of users with a positive session score,
+            best first.
+
+        Raises
+        ------
+        NotImplementedError
+            If called from abstract class instead of concrete class
+        """
+        raise NotImplementedError("Should have implemented this")
+
+    def top_overall(self, count):
+        """Return the users with the most wins, then the most points.
+
+        Parameters
+        ----------
+        count : int
+            The maximum number of users to return.
+
+        Returns
+        -------
+        list of [str, int, int]
+            [username, wins, overall] of the best users, best first.
+
+        Raises
+        ------
+        NotImplementedError
+            If called from abstract class instead of concrete class
+        """
+        raise NotImplementedError("Should have implemented this")
+
+    def compact(self):
+        """Make sure every change so far is persisted.
+
+        Raises
+        ------
+        NotImplementedError
+            If called from abstract class instead of concrete class
+        """
+        raise NotImplementedError("Should have implemented this")
+
+    def close(self):
+        """Persist every change and release the underlying files.
+
+        Raises
+        ------
+        NotImplementedError
+            If called from abstract class instead of concrete class
+        """
+        raise NotImplementedError("Should have implemented this")
+
+class Leaderboard(object):
+    """Top users by some ranking, kept up to date as scores change so
+    that a top-N query does not have to look at every user.
+
+    The board only stays correct while scores of users outside of it
+    can only go up. Any other change has to be reported through
+    :meth:`invalidate`, and the board is rebuilt from all users with
+    :func:`heapq.nlargest` on the next query.
+
+    Parameters
+    ----------
+    size : int
+        The number of users kept on the board.
+    key : callable
+        Returns the ranking key of a username; higher is better. Keys
+        must be unique.
+
+    Attributes
+    ----------
+    size : int
+        The number of users kept on the board.
+    _key : callable
+        Returns the ranking key of a username.
+    _users : list of str
+        The best users, best first.
+    _valid : bool
+        False if :attr:`_users` has to be rebuilt.
+    """
+    def __init__(self, size, key):
+        self.size = size
+        self._key = key
+        self._users = []
+        self._valid = False
+
+    def invalidate(self):
+        """Mark the board for a rebuild on the next query."""
+        self._valid = False
+
+    def reset(self):
+        """Empty the board, for when every score was reset to 0."""
+        self._users = []
+        self._valid = True
+
+    def update(self, username):
+        """Report that the ranking key of a user went up.
+
+        Parameters
+        ----------
+        username : str
+            The user.
+        """
+        if not self._valid:
+            return
+        users = self._users
+        if username in users:
+            users.sort(key=self._key, reverse=True)
+        elif (len(users) < self.size
+              or self._key(username) > self._key(users[-1])):
+            users.append(username)
+            users.sort(key=self._key, reverse=True)
+            del users[self.size:]
+
+    def top(self, count, usernames):
+        """Return the best users.
+
+        Parameters
+        ----------
+        count : int
+            The maximum number of users to return.
+        usernames : iterable of str
+            All users, used if the board has to be rebuilt or is
+            smaller than `count`.
+
+        Returns
+        -------
+        list of str
+            The best users, best first.
+        """
+        if count > self.size:
+            return heapq.nlargest(count, usernames, key=self._key)
+        if not self._valid:
+            self._users = heapq.nlargest(self.size, usernames,
+                                         key=self._key)
+            self._valid = True
+        return self._users[: count]
+
+class JsonScoreStore(AbstractScoreStore):
+    """User scores held in memory and persisted as a JSON snapshot plus
+    an append-only journal of score changes.
+
+    Every change is appended to the journal as one line, so saving a
+    score costs the same no matter how many users there are. The
+    journal is periodically folded into a new snapshot, which is
+    written to a temporary file, synced and renamed over the old one.
+    The journal starts with the SHA-1 of the snapshot it applies to, so
+    a journal which is already part of the snapshot (the bot stopped
+    between renaming the snapshot and starting a new journal) is never
+    replayed twice.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path of the JSON snapshot.
+    compact_every : int, optional
+        Number of journal entries after which the journal is compacted
+        into the snapshot.
+    leaderboard_size : int, optional
+        Number of users kept on the incrementally updated session and
+        overall leaderboards.
+
+    Attributes
+    ----------
+    userscores : dict
+        Maps a username to its [session, overall, wins] scores.
+    path : str
+        Path of the JSON snapshot.
+    journal_path : str
+        Path of the journal.
+    compact_every : int
+        Number of journal entries after which the journal is compacted.
+    _journal : file object
+        The journal, opened for appending.
+    _pending : int
+        Number of entries in the journal.
+    _ranks : dict
+        Maps a username to its position in :attr:`userscores`, which
+        breaks ties on the leaderboards.
+    _session_board : :class:`Leaderboard`
+        Users with the highest session scores.
+    _overall_board : :class:`Leaderboard`
+        Users with the most wins, then the most points.
+    """
+    def __init__(self, path="userscores.txt", compact_every=1000,
+                 leaderboard_size=10):
+        self.userscores = {}
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.compact_every = compact_every
+        self._journal = None
+        self._pending = 0
+        self._ranks = {}
+        self._session_board = Leaderboard(
+            leaderboard_size,
+            lambda x: (self.userscores[x][SESSION], -self._ranks[x]))
+        self._overall_board = Leaderboard(
+            leaderboard_size,
+            lambda x: (self.userscores[x][MATCH],
+                       self.userscores[x][OVERALL], -self._ranks[x]))
+
+    def load(self):
+        """Load the snapshot and replay the journal. A new snapshot is
+        created if there is none.
+
+        Returns
+        -------
+        bool
+            True if an existing snapshot was loaded.
+        """
+        self._session_board.invalidate()
+        self._overall_board.invalidate()
+        if not os.path.exists(self.path):
+            self.userscores.clear()
+            self.userscores["trivia_dummy"] = [0, 0, 0]
+            self._ranks = {"trivia_dummy": 0}
+            self.compact()
+            return False
+        with open(self.path, "rb") as fp:
+            data = fp.read()
+        self.userscores.clear()
+        self.userscores.update(json.loads(data))
+        digest = hashlib.sha1(data).hexdigest()
+        replayed = self._replay(digest)
+        self._ranks = {username: i
+                       for i, username in enumerate(self.userscores)}
+        if replayed:
+            # fold the replayed entries (and any incomplete last entry)
+            # into a fresh snapshot
+            self.compact()
+        else:
+            self._start_journal(digest)
+        return True
+
+    def get(self, username):
+        return self.userscores[username]
+
+    def add(self, username, index, value):
+        if username not in self.userscores:
+            self.userscores[username] = [0, 0, 0]
+            self._ranks[username] = len(self._ranks)
+            # a new user may still fit on a board that is not full
+            self._session_board.update(username)
+            self._overall_board.update(username)
+        self.userscores[username][index] += value
+        self._record(["add", username, index, value])
+        board = (self._session_board if index == SESSION
+                 else self._overall_board)
+        if value < 0:
+            board.invalidate()
+        else:
+            board.update(username)
+
+    def clear_session(self):
+        for scores in self.userscores.values():
+            scores[SESSION] = 0
+        self._record(["clear"])
+        self._session_board.reset()
+
+    def top_session(self, count):
+        return [[k, self.userscores[k][SESSION]]
+                for k in self._session_board.top(count, self.userscores)
+                if self.userscores[k][SESSION] > 0]
+
+    def top_overall(self, count):
+        return [[k, self.userscores[k][MATCH], self.userscores[k][OVERALL]]
+                for k in self._overall_board.top(count, self.userscores)]
+
+    def compact(self):
+        """Write all scores to a new snapshot and start an empty
+        journal.
+        """
+        data = json.dumps(self.userscores).encode("utf-8")
+        self._write_atomic(self.path, data)
+        self._start_journal(hashlib.sha1(data).hexdigest())
+
+    def close(self):
+        """Compact the journal and close it."""
+        self.compact()
+        self._journal.close()
+        self._journal = None
+
+    def _record(self, entry):
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        self._pending += 1
+        if self._pending >= self.compact_every:
+            self.compact()
+
+    def _replay(self, digest):
+        """Apply the journal entries to :attr:`userscores` if the
+        journal belongs to the snapshot with the given SHA-1.
+
+        Returns
+        -------
+        bool
+            True if any journal entry was replayed.
+        """
+        if not os.path.exists(self.journal_path):
+            return False
+        replayed = False
+        with open(self.journal_path, "r", encoding="utf-8") as fp:
+            if fp.readline().strip() != digest:
+                return False
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # incomplete last entry from an interrupted write
+                    break
+                if entry[0] == "add":
+                    _, username, index, value = entry
+                    self.userscores.setdefault(username,
+                                               [0, 0, 0])[index] += value
+                elif entry[0] == "clear":
+                    for scores in self.userscores.values():
+                        scores[SESSION] = 0
+                replayed = True
+        return replayed
+
+    def _start_journal(self, digest):
+        if self._journal is not None:
+            self._journal.close()
+        self._write_atomic(self.journal_path,
+                           f"{digest}\n".encode("utf-8"))
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._pending = 0
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fp:
+            fp.write(data)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_path, path)
+
+class SqliteScoreStore(AbstractScoreStore):
+    """User scores kept in an SQLite database.
+
+    Only the users that are looked up are read into memory. Leaderboard
+    queries are served from indexes on (wins, overall) and on the
+    positive session scores, so they do not scan every user. Changes
+    are committed in batches.
+
+    Several stores (e.g. one per channel) can keep their scores in
+    separate tables of the same database. They then share a single
+    connection, so that a batch left uncommitted by one store does not
+    lock out the others.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path of the database file.
+    commit_every : int, optional
+        Number of changes after which they are committed.
+    table : str, optional
+        Name of the table holding the scores.
+
+    Attributes
+    ----------
+    path : str
+        Path of the database file.
+    commit_every : int
+        Number of changes after which they are committed.
+    table : str
+        Name of the table holding the scores.
+    _connection : :class:`sqlite3.Connection`
+        The database connection.
+    _pending : int
+        Number of uncommitted changes.
+    """
+    COLUMNS = ("session", "overall", "wins")
+    #: Open connections by database path, with the number of stores
+    #: using each
+    _shared = {}
+
+    def __init__(self, path="userscores.db", commit_every=50,
+                 table="userscores"):
+        self.path = path
+        self.commit_every = commit_every
+        self.table = table
+        self._connection = None
+        self._pending = 0
+
+    def load(self):
+        """Open the database and create the table if needed.
+
+        Returns
+        -------
+        bool
+            True if the table already existed.
+        """
+        shared = self._shared.get(self.path)
+        if shared is None:
+            # wait for other processes writing to the same database
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.executescript("""
+                PRAGMA journal_mode = WAL;
+                PRAGMA synchronous = NORMAL;
+            """)
+            shared = self._shared[self.path] = [connection, 0]
+        shared[1] += 1
+        self._connection = shared[0]
+        exists = self._has_table(self.table)
+        table = self.table
+        self._connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS "{table}" (
+                username TEXT PRIMARY KEY,
+                session INTEGER NOT NULL DEFAULT 0,
+                overall INTEGER NOT NULL DEFAULT 0,
+                wins INTEGER NOT NULL DEFAULT 0);
+            CREATE INDEX IF NOT EXISTS "{table}_overall"
+                ON "{table}" (wins DESC, overall DESC);
+            CREATE INDEX IF NOT EXISTS "{table}_session"
+                ON "{table}" (session DESC) WHERE session > 0;
+        """)
+        return exists
+
+    def import_scores(self, userscores):
+        """Bulk load scores, e.g. from a :class:`JsonScoreStore`.
+
+        Parameters
+        ----------
+        userscores : dict
+            Maps a username to its [session, overall, wins] scores.
+        """
+        with self._connection:
+            self._connection.executemany(
+                f'INSERT OR REPLACE INTO "{self.table}" '
+                "(username, session, overall, wins) VALUES (?, ?, ?, ?)",
+                ((username, *scores) for username, scores
+                 in userscores.items()))
+        self._pending = 0
+
+    def import_table(self, table):
+        """Copy the scores kept in another table of the same database,
+        e.g. the table of a renamed channel. The other table is left
+        as it is.
+
+        Parameters
+        ----------
+        table : str
+            Name of the other table.
+
+        Returns
+        -------
+        bool
+            True if the other table existed.
+        """
+        if not self._has_table(table):
+            return False
+        with self._connection:
+            self._connection.execute(
+                f'INSERT OR REPLACE INTO "{self.table}" '
+                "(username, session, overall, wins) "
+                f'SELECT username, session, overall, wins FROM "{table}"')
+        self._pending = 0
+        return True
+
+    def get(self, username):
+        row = self._connection.execute(
+            f'SELECT session, overall, wins FROM "{self.table}" '
+            "WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            raise KeyError(username)
+        return list(row)
+
+    def add(self, username, index, value):
+        column = self.COLUMNS[index]
+        self._connection.execute(
+            f'INSERT INTO "{self.table}" (username, {column}) '
+            f"VALUES (?, ?) ON CONFLICT (username) DO UPDATE "
+            f"SET {column} = {column} + excluded.{column}",
+            (username, value))
+        self._changed()
+
+    def clear_session(self):
+        self._connection.execute(
+            f'UPDATE "{self.table}" SET session = 0 WHERE session > 0')
+        self._changed()
+
+    def top_session(self, count):
+        return [list(row) for row in self._connection.execute(
+            f'SELECT username, session FROM "{self.table}" '
+            "WHERE session > 0 ORDER BY session DESC, rowid LIMIT ?",
+            (count,))]
+
+    def top_overall(self, count):
+        return [list(row) for row in self._connection.execute(
+            f'SELECT username, wins, overall FROM "{self.table}" '
+            "ORDER BY wins DESC, overall DESC, rowid LIMIT ?", (count,))]
+
+    def compact(self):
+        self._connection.commit()
+        self._pending = 0
+
+    def close(self):
+        self.compact()
+        shared = self._shared[self.path]
+        shared[1] -= 1
+        if not shared[1]:
+            del self._shared[self.path]
+            self._connection.close()
+        self._connection = None
+
+    def _has_table(self, table):
+        return self._connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table,)).fetchone() is not None
+
+    def _changed(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.compact()
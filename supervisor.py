@@ -0,0 +1,179 @@
+"""
+.. module:: supervisor
+   :synopsis: Spreading channels over worker processes.
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+import signal
+import time
+
+LOG = logging.getLogger("TTB.supervisor")
+
+#: Exit status of a worker that could not start, e.g. because its
+#: config or scores could not be loaded
+STARTUP_FAILED = 2
+#: Exit status of a worker that was stopped on purpose by !stop
+STOPPED = 3
+
+class HashRing(object):
+    """Consistent hash of keys (e.g. channel names) onto nodes (e.g.
+    worker processes).
+
+    Every node is placed at many points of a ring of hashes, and a key
+    belongs to the node of the first point after the hash of the key.
+    Adding or removing a node only moves the keys of that node, and the
+    keys are spread evenly even with few nodes. The hash does not
+    depend on the process, so every process finds the same node for a
+    key.
+
+    Parameters
+    ----------
+    nodes : iterable
+        The nodes. Their string forms must be distinct.
+    replicas : int, optional
+        The number of points of each node on the ring.
+
+    Attributes
+    ----------
+    _hashes : list of int
+        The points on the ring, in ascending order.
+    _nodes : list
+        The node of each point.
+    """
+    def __init__(self, nodes, replicas=100):
+        points = sorted((self._hash(f"{node}:{replica}"), node)
+                        for node in nodes for replica in range(replicas))
+        self._hashes = [point[0] for point in points]
+        self._nodes = [point[1] for point in points]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[: 8],
+                              "big")
+
+    def node(self, key):
+        """Find the node of a key.
+
+        Parameters
+        ----------
+        key : str
+            The key.
+
+        Returns
+        -------
+        object
+            The node.
+        """
+        index = bisect.bisect(self._hashes, self._hash(key))
+        return self._nodes[index % len(self._nodes)]
+
+class Supervisor(object):
+    """Runs worker processes and restarts those that crash.
+
+    A worker which exits with status :data:`STOPPED` has been stopped
+    on purpose by !stop, and then all workers are stopped. A worker
+    which exits with any other status, including 0 (e.g. after being
+    sent SIGTERM by something other than the supervisor) and
+    :data:`STARTUP_FAILED`, is restarted after a delay that doubles
+    with every crash in a row, up to `max_backoff`. All workers are also
+    stopped when the supervisor receives SIGTERM.
+
+    Parameters
+    ----------
+    commands : dict
+        Maps a worker to the command line that runs it.
+    min_backoff : float, optional
+        Seconds before a crashed worker is first restarted.
+    max_backoff : float, optional
+        Longest delay before a restart. A worker which ran for longer
+        than this is restarted after `min_backoff` again.
+
+    Attributes
+    ----------
+    commands : dict
+        Maps a worker to the command line that runs it.
+    min_backoff : float
+        Seconds before a crashed worker is first restarted.
+    max_backoff : float
+        Longest delay before a restart.
+    restarts : dict
+        Maps a worker to the number of times it was restarted.
+    """
+    def __init__(self, commands, min_backoff=1.0, max_backoff=60.0):
+        self.commands = commands
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.restarts = {worker: 0 for worker in commands}
+
+    async def run(self):
+        """Run the workers until one of them stops on purpose, SIGTERM
+        is received or this coroutine is cancelled, then stop the
+        others.
+        """
+        loop = asyncio.get_running_loop()
+        terminated = asyncio.Event()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, terminated.set)
+        except (NotImplementedError, RuntimeError):
+            # no signal handlers on Windows
+            pass
+        tasks = [asyncio.create_task(self._keep(worker))
+                 for worker in self.commands]
+        waiter = asyncio.create_task(terminated.wait())
+        try:
+            await asyncio.wait([*tasks, waiter],
+                               return_when=asyncio.FIRST_COMPLETED)
+            if terminated.is_set():
+                LOG.info("Terminated, stopping the workers.")
+        finally:
+            waiter.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                loop.remove_signal_handler(signal.SIGTERM)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    async def _keep(self, worker):
+        """Run a worker, restarting it whenever it crashes."""
+        backoff = self.min_backoff
+        while True:
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                *self.commands[worker])
+            LOG.info("Worker %s started (pid %d).", worker, process.pid)
+            try:
+                status = await process.wait()
+            except asyncio.CancelledError:
+                await self._stop(worker, process)
+                raise
+            if status == STOPPED:
+                LOG.info("Worker %s stopped.", worker)
+                return
+            if time.monotonic() - started > self.max_backoff:
+                backoff = self.min_backoff
+            if status == STARTUP_FAILED:
+                LOG.error("Worker %s failed to start, retrying in %.0fs.",
+                          worker, backoff)
+            else:
+                LOG.error("Worker %s exited with status %d, restarting in "
+                          "%.0fs.", worker, status, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+            self.restarts[worker] += 1
+
+    @staticmethod
+    async def _stop(worker, process, timeout=10.0):
+        """Ask a worker to stop, and kill it if it does not."""
+        if process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            LOG.warning("Worker %s did not stop, killing it.", worker)
+            process.kill()
+            await process.wait()
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+
+import twitchtriviabot as ttb
+
+class TestLoadChannels(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(directory.name)
+        saved = (ttb.ChatVar.CHANS, ttb.ChatVar.LEGACY_CHAN,
+                 ttb.Var.score_backend, ttb.Var.worker, ttb.Var.workers)
+        self.addCleanup(self.restore, *saved)
+        ttb.Var.worker, ttb.Var.workers = None, 1
+
+    @staticmethod
+    def restore(chans, legacy, backend, worker, workers):
+        for chan in ttb.Var.channels.values():
+            chan.store.close()
+        ttb.Var.channels = {}
+        (ttb.ChatVar.CHANS, ttb.ChatVar.LEGACY_CHAN, ttb.Var.score_backend,
+         ttb.Var.worker, ttb.Var.workers) = (chans, legacy, backend, worker,
+                                             workers)
+
+    def load(self, chans, legacy=None, backend="json"):
+        for chan in ttb.Var.channels.values():
+            chan.store.close()
+        ttb.Var.channels = {}
+        ttb.ChatVar.CHANS = chans
+        ttb.ChatVar.LEGACY_CHAN = legacy
+        ttb.Var.score_backend = backend
+        ttb.loadchannels()
+
+    def write_legacy(self):
+        with open("userscores.txt", "w", encoding="utf-8") as fp:
+            json.dump({"alice": [0, 5, 1]}, fp)
+
+    def test_scores_follow_channel_not_order(self):
+        self.load(["#a", "#b"])
+        ttb.Var.channels["#b"].store.add("bob", 1, 2)
+        self.load(["#b", "#a"])
+        self.assertEqual(ttb.Var.channels["#b"].user_overall("bob"), 2)
+        self.assertNotIn("bob", ttb.Var.channels["#a"].store.userscores)
+
+    def test_legacy_scores_move_to_legacy_channel(self):
+        self.write_legacy()
+        self.load(["#a", "#b"], legacy="#b")
+        self.assertEqual(ttb.Var.channels["#b"].user_overall("alice"), 5)
+        self.assertNotIn("alice", ttb.Var.channels["#a"].store.userscores)
+        self.assertFalse(os.path.exists("userscores.txt"))
+        self.assertTrue(os.path.exists("userscores_b.txt"))
+
+    def test_legacy_scores_unassigned(self):
+        self.write_legacy()
+        self.load(["#a", "#b"])
+        for chan in ttb.Var.channels.values():
+            self.assertNotIn("alice", chan.store.userscores)
+        self.assertTrue(os.path.exists("userscores.txt"))
+
+    def test_legacy_scores_into_sqlite(self):
+        self.write_legacy()
+        self.load(["#a"], legacy="#a", backend="sqlite")
+        self.assertEqual(ttb.Var.channels["#a"].user_overall("alice"), 5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+from unittest import mock
+
+import twitchtriviabot as ttb
+
+class TestCooldowns(unittest.TestCase):
+    def setUp(self):
+        self.chan = ttb.ChannelVar("#chan", "userscores")
+        self.now = 1000.0
+        patcher = mock.patch("time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sent = []
+        patcher = mock.patch.object(
+            ttb, "send_msg", lambda chan, msg, priority: self.sent.append(msg))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_user_cooldown(self):
+        passed = lambda username, command: ttb.cooldown_passed(
+            self.chan, username, command, 10.0)
+        self.assertTrue(passed("alice", "!score"))
+        self.assertFalse(passed("alice", "!score"))
+        # other users and other commands are not held back
+        self.assertTrue(passed("bob", "!score"))
+        self.assertTrue(passed("alice", "!triviatop3"))
+        self.now += 10.0
+        self.assertTrue(passed("alice", "!score"))
+
+    def test_expired_uses_are_pruned(self):
+        for number in range(100):
+            ttb.cooldown_passed(self.chan, f"user{number}", "!score", 10.0)
+        self.now += 10.0
+        ttb.cooldown_passed(self.chan, "alice", "!score", 10.0)
+        self.assertEqual(list(self.chan.cooldowns["!score"]), ["alice"])
+
+    def test_cooldown_of_each_command(self):
+        calls = []
+        self.addCleanup(ttb.Var.COMMANDS.pop, "!fast")
+        self.addCleanup(ttb.Var.COMMANDS.pop, "!slow")
+        ttb.command("!fast", cooldown=2.0)(
+            lambda chan, username: calls.append("!fast"))
+        ttb.command("!slow", cooldown=30.0)(
+            lambda chan, username: calls.append("!slow"))
+        for _ in range(2):
+            ttb.trivia_commandswitch(self.chan, "!fast", "alice")
+            ttb.trivia_commandswitch(self.chan, "!slow", "alice")
+            self.now += 2.0
+        self.assertEqual(calls, ["!fast", "!slow", "!fast"])
+
+    def test_user_cooldown_setting(self):
+        patcher = mock.patch.object(
+            ttb, "trivia_score",
+            lambda chan, username: f"{username} has 0 points")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ttb.Var, "user_cooldown", 30)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        ttb.trivia_commandswitch(self.chan, "!score", "alice")
+        self.now += 20.0
+        ttb.trivia_commandswitch(self.chan, "!score", "alice")
+        self.assertEqual(self.sent, ["alice has 0 points"])
+        # the setting is looked up on each use, e.g. after !loadconfig
+        ttb.Var.user_cooldown = 10
+        ttb.trivia_commandswitch(self.chan, "!score", "alice")
+        self.assertEqual(self.sent, ["alice has 0 points"] * 2)
+
+    def test_global_cooldown_per_reply(self):
+        build = lambda username: lambda: f"{username} has 0 points"
+        self.assertTrue(ttb.send_reply(self.chan, ("!score", "alice"),
+                                       build("alice")))
+        # only the same reply is held back
+        self.assertFalse(ttb.send_reply(self.chan, ("!score", "alice"),
+                                        build("alice")))
+        self.assertTrue(ttb.send_reply(self.chan, ("!score", "bob"),
+                                       build("bob")))
+        self.now += ttb.Var.global_cooldown
+        self.assertTrue(ttb.send_reply(self.chan, ("!score", "alice"),
+                                       build("alice")))
+        self.assertEqual(self.sent, ["alice has 0 points", "bob has 0 points",
+                                     "alice has 0 points"])
+
+    def test_users_asking_in_turn_are_answered(self):
+        patcher = mock.patch.object(
+            ttb, "trivia_score",
+            lambda chan, username: f"{username} has 0 points")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        ttb.trivia_commandswitch(self.chan, "!score", "alice")
+        self.now += 2.0
+        ttb.trivia_commandswitch(self.chan, "!score", "bob")
+        self.assertEqual(self.sent, ["alice has 0 points", "bob has 0 points"])
+
+    def test_dropped_reply_is_not_a_use(self):
+        patcher = mock.patch.object(ttb, "trivia_top3",
+                                    lambda chan: "No scores yet")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        ttb.trivia_commandswitch(self.chan, "!triviatop3", "alice")
+        self.now += 2.0
+        # the same reply was just sent, so bob's use is not counted
+        ttb.trivia_commandswitch(self.chan, "!triviatop3", "bob")
+        self.now += ttb.Var.global_cooldown
+        ttb.trivia_commandswitch(self.chan, "!triviatop3", "bob")
+        self.assertEqual(self.sent, ["No scores yet", "No scores yet"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import random
+import unittest
+
+import editdistance
+from editdistance import DistanceAlgorithm, EditDistance
+
+def make_pairs(count, seed=0):
+    rng = random.Random(seed)
+    word = lambda: "".join(rng.choice("abcé ")
+                           for _ in range(rng.randrange(0, 12)))
+    return [(word(), word(), rng.choice([0, 1, 2, 3, 5, 2 ** 31 - 1]))
+            for _ in range(count)]
+
+class TestDamerauOsaBitParallel(unittest.TestCase):
+    def check_same_results(self):
+        expected = EditDistance(DistanceAlgorithm.DAMERUAUOSA)
+        for is_thread_safe in (False, True):
+            comparer = EditDistance(DistanceAlgorithm.DAMERAUOSA_BITPARALLEL,
+                                    is_thread_safe)
+            for string_1, string_2, max_distance in make_pairs(20000):
+                self.assertEqual(
+                    comparer.compare(string_1, string_2, max_distance),
+                    expected.compare(string_1, string_2, max_distance),
+                    (string_1, string_2, max_distance))
+
+    def test_same_results_as_damerau_osa(self):
+        self.check_same_results()
+
+    def test_same_results_without_compiled_backend(self):
+        compiled = editdistance._compiled_osa
+        self.addCleanup(setattr, editdistance, "_compiled_osa", compiled)
+        editdistance._compiled_osa = None
+        self.check_same_results()
+
+    def test_none(self):
+        comparer = EditDistance(DistanceAlgorithm.DAMERAUOSA_BITPARALLEL)
+        self.assertEqual(comparer.compare(None, "abc", 5), 3)
+        self.assertEqual(comparer.compare(None, None, 5), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import scorestore
+import twitchtriviabot as ttb
+from questionbank import Question
+
+class TestMatchStats(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.chan = ttb.ChannelVar("#chan", "userscores_chan")
+        self.chan.store = scorestore.JsonScoreStore(
+            os.path.join(directory.name, "userscores_chan.txt"))
+        self.chan.store.load()
+        self.addCleanup(self.chan.store.close)
+        self.chan.qs = [Question("Geography", "Largest ocean?",
+                                 ("Pacific", None))]
+        self.chan.num_qs = 1
+        self.chan.is_active = True
+        for name in ("send_msg", "schedule"):
+            patcher = mock.patch.object(ttb, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def play(self, finish):
+        counts = lambda: {tier: ttb.MATCH_TIERS.value(tier)
+                          for tier in ("exact", "length", "distance_miss")}
+
+        before = counts()
+        ttb.trivia_callquestion(self.chan)
+        ttb.trivia_checkanswers(self.chan, [("bob", "atlantic ocean"),
+                                            ("bob", "indian")])
+        finish()
+        after = counts()
+        return {tier: after[tier] - before[tier] for tier in after}
+
+    def test_counted_when_skipped(self):
+        counted = self.play(lambda: ttb.trivia_skipquestion(self.chan))
+        self.assertEqual(counted, {"exact": 0, "length": 1,
+                                   "distance_miss": 1})
+
+    def test_counted_when_ended_early(self):
+        counted = self.play(lambda: ttb.trivia_end(self.chan))
+        self.assertEqual(counted, {"exact": 0, "length": 1,
+                                   "distance_miss": 1})
+
+    def test_counted_once_when_answered(self):
+        def finish():
+            ttb.trivia_checkanswers(self.chan, [("alice", "pacific")])
+            ttb.trivia_end(self.chan)
+
+        counted = self.play(finish)
+        self.assertEqual(counted, {"exact": 1, "length": 1,
+                                   "distance_miss": 1})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import unittest
+
+import irc
+
+class TestMessage(unittest.TestCase):
+    def test_privmsg(self):
+        message = irc.Message.parse(
+            ":alice!alice@alice.tmi.twitch.tv PRIVMSG #chan :pacific ocean")
+        self.assertEqual(message.command, "PRIVMSG")
+        self.assertEqual(message.nick, "alice")
+        self.assertEqual(message.channel, "#chan")
+        self.assertEqual(message.trailing, "pacific ocean")
+        self.assertEqual(message.tags, {})
+
+    def test_trailing_with_colons(self):
+        message = irc.Message.parse(
+            ":alice!alice@alice.tmi.twitch.tv PRIVMSG #chan :a :b: c")
+        self.assertEqual(message.params, ["#chan", "a :b: c"])
+
+    def test_ping(self):
+        message = irc.Message.parse("PING :tmi.twitch.tv")
+        self.assertIsNone(message.prefix)
+        self.assertIsNone(message.nick)
+        self.assertEqual(message.command, "PING")
+        self.assertEqual(message.params, ["tmi.twitch.tv"])
+
+    def test_server_message(self):
+        message = irc.Message.parse(":tmi.twitch.tv 001 bot :Welcome, GLHF!")
+        self.assertIsNone(message.nick)
+        self.assertIsNone(message.channel)
+        self.assertEqual(message.params, ["bot", "Welcome, GLHF!"])
+
+    def test_no_trailing(self):
+        message = irc.Message.parse(":bob!bob@bob.tmi.twitch.tv JOIN #chan")
+        self.assertEqual(message.nick, "bob")
+        self.assertEqual(message.params, ["#chan"])
+        self.assertEqual(message.trailing, "#chan")
+
+    def test_empty_line(self):
+        message = irc.Message.parse("")
+        self.assertEqual(message.command, "")
+        self.assertEqual(message.trailing, "")
+
+    def test_tags(self):
+        message = irc.Message.parse(
+            "@badges=;display-name=Alice;msg=a\\sb\\:c;flag "
+            ":alice!alice@alice.tmi.twitch.tv PRIVMSG #chan :hi")
+        self.assertEqual(message.tags, {"badges": "", "display-name": "Alice",
+                                        "msg": "a b;c", "flag": ""})
+        self.assertEqual(message.trailing, "hi")
+
+    def test_unescape_tag(self):
+        self.assertEqual(irc.unescape_tag("a\\sb\\:c\\\\d"),
+                         "a b;c\\d")
+        self.assertEqual(irc.unescape_tag("line\\r\\n"), "line\r\n")
+        # unknown escapes drop the backslash, a trailing one is dropped
+        self.assertEqual(irc.unescape_tag("\\xy\\"), "xy")
+
+class TestRateLimiter(unittest.TestCase):
+    def test_window(self):
+        limiter = irc.RateLimiter(2, 30.0)
+        self.assertEqual(limiter.delay(0.0), 0.0)
+        limiter.spend(0.0)
+        limiter.spend(10.0)
+        # the first token comes back 30 seconds after it was spent
+        self.assertEqual(limiter.delay(20.0), 10.0)
+        self.assertEqual(limiter.delay(30.0), 0.0)
+
+    def test_lower_limit(self):
+        limiter = irc.RateLimiter(4, 30.0)
+        for now in (0.0, 1.0, 2.0):
+            limiter.spend(now)
+        self.assertEqual(limiter.delay(5.0), 0.0)
+        self.assertEqual(limiter.delay(5.0, limit=3), 25.0)
+
+class TestSendQueue(unittest.TestCase):
+    def run_queue(self, put, seconds, limit=4, period=60.0):
+        sent = []
+
+        async def run():
+            queue = irc.SendQueue(sent.append, limit, period)
+            task = asyncio.create_task(queue.run())
+            await put(queue)
+            await asyncio.sleep(seconds)
+            task.cancel()
+            return queue
+
+        return asyncio.run(run()), sent
+
+    def test_replies_keep_budget_for_game(self):
+        async def put(queue):
+            for number in range(6):
+                queue.put(f"reply {number}", irc.REPLY)
+            await asyncio.sleep(0.05)
+            queue.put("question", irc.GAME)
+
+        queue, sent = self.run_queue(put, 0.05)
+        # replies may use 3 of the 4 messages, the last goes to the game
+        self.assertEqual(sent, ["reply 0", "reply 1", "reply 2", "question"])
+        self.assertEqual(len(queue), 3)
+
+    def test_game_overtakes_replies(self):
+        async def put(queue):
+            queue.put("reply", irc.REPLY)
+            queue.put("question", irc.GAME)
+
+        _, sent = self.run_queue(put, 0.05)
+        self.assertEqual(sent, ["question", "reply"])
+
+    def test_coalesces_pending_replies(self):
+        async def put(queue):
+            queue.put("score", irc.REPLY)
+            queue.put("score", irc.REPLY)
+            queue.put("hint", irc.GAME)
+            queue.put("hint", irc.GAME)
+
+        queue, sent = self.run_queue(put, 0.05)
+        self.assertEqual(sent, ["hint", "hint", "score"])
+        self.assertEqual(queue.stats["coalesced"], 1)
+
+    def test_waits_for_budget(self):
+        async def put(queue):
+            for number in range(3):
+                queue.put(f"hint {number}")
+
+        _, sent = self.run_queue(put, 0.1, limit=2, period=0.3)
+        self.assertEqual(sent, ["hint 0", "hint 1"])
+        _, sent = self.run_queue(put, 0.4, limit=2, period=0.3)
+        self.assertEqual(sent, ["hint 0", "hint 1", "hint 2"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import array
+import os
+import tempfile
+import unittest
+
+import questionbank
+from questionbank import Question
+
+def make_questions(count):
+    return [Question("Geography", f"Question {number}?", (f"answer{number}",
+                                                          None))
+            for number in range(count)]
+
+class TestSample(unittest.TestCase):
+    def check_sample(self, bank, size):
+        for count in (0, 1, size // 2, size):
+            questions = bank.sample(count)
+            self.assertEqual(len(questions), count)
+            texts = [question.question for question in questions]
+            self.assertEqual(len(set(texts)), count)
+        with self.assertRaises(ValueError):
+            bank.sample(size + 1)
+
+    def test_question_bank(self):
+        self.check_sample(questionbank.QuestionBank(make_questions(20)), 20)
+
+    def test_mapped_bank(self):
+        rows = [f"Geography,Question {number}?,answer{number},,\n"
+                .encode("utf-8") for number in range(20)]
+        offsets = array.array("Q")
+        position = 0
+        for row in rows:
+            offsets.extend((position, position + len(row)))
+            position += len(row)
+        bank = questionbank.MappedBank(b"".join(rows), offsets)
+        self.check_sample(bank, 20)
+        self.assertEqual(bank[3].answers, ("answer3", None))
+
+def write_set(path, count, answer="answer"):
+    with open(path, "w", encoding="utf-8", newline="") as fp:
+        fp.write("Topic/Game,Question,Answer,Answer 2,Creator\r\n")
+        for number in range(count):
+            fp.write(f"Geography,Question {number}?,{answer}{number},,\r\n")
+        # a blank template row
+        fp.write(",,,,\r\n")
+
+class TestIndexedCsvBank(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "triviaset.csv")
+        write_set(self.path, 10)
+
+    def test_loads_usable_rows(self):
+        for _ in range(2):
+            # compiled, then from the cache
+            bank = questionbank.IndexedCsvBank(self.path)
+            self.assertEqual(len(bank), 10)
+            self.assertEqual(bank[9].question, "Question 9?")
+            self.assertEqual(bank[9].answers, ("answer9", None))
+            bank.close()
+
+    def test_does_not_map_source(self):
+        bank = questionbank.IndexedCsvBank(self.path)
+        self.addCleanup(bank.close)
+        # edited in place, as an editor saving over the file does
+        with open(self.path, "r+b") as fp:
+            fp.truncate(0)
+        self.assertEqual(len(bank.sample(10)), 10)
+        self.assertEqual(bank[9].answers, ("answer9", None))
+
+    def test_same_size_edit_with_old_mtime(self):
+        questionbank.IndexedCsvBank(self.path).close()
+        stat = os.stat(self.path)
+        write_set(self.path, 10, answer="ANSWER")
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(os.path.getsize(self.path), stat.st_size)
+        bank = questionbank.IndexedCsvBank(self.path)
+        self.addCleanup(bank.close)
+        self.assertEqual(bank[9].answers, ("ANSWER9", None))
+
+if __name__ == "__main__":
+    unittest.main()
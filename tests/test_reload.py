@@ -0,0 +1,94 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import twitchtriviabot as ttb
+
+def write_set(path, answers):
+    with open(path, "w", encoding="utf-8", newline="") as fp:
+        fp.write("Topic/Game,Question,Answer,Answer 2,Creator\r\n")
+        for number, answer in enumerate(answers):
+            fp.write(f"Geography,Question {number}?,{answer},,\r\n")
+
+class TestReloadSet(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, "triviaset")
+        self.path = f"{self.filename}.csv"
+        self.addCleanup(self.restore, ttb.Var.filename, ttb.Var.filetype)
+        ttb.Var.filename, ttb.Var.filetype = self.filename, "csv"
+
+    @staticmethod
+    def restore(filename, filetype):
+        if ttb.Var.ts is not None:
+            ttb.Var.ts.close()
+        ttb.Var.ts = ttb.Var.ts_stat = ttb.Var.ts_loading = None
+        ttb.Var.filename, ttb.Var.filetype = filename, filetype
+
+    def test_edit_then_reload(self):
+        write_set(self.path, ["pacific", "atlantic", "indian"])
+
+        async def run():
+            await ttb.loadset()
+            old_ts = ttb.Var.ts
+            self.assertEqual(len(old_ts), 3)
+
+            # saved over in place while the set is in use
+            with open(self.path, "r+b") as fp:
+                fp.truncate(0)
+            write_set(self.path, ["arctic", "southern"])
+            self.assertNotEqual(ttb.setstat(), ttb.Var.ts_stat)
+            # a session drawing from the loaded set is not affected
+            self.assertEqual(
+                sorted(q.answers[0] for q in old_ts.sample(3)),
+                ["atlantic", "indian", "pacific"])
+
+            await ttb.loadset()
+            self.assertIsNot(ttb.Var.ts, old_ts)
+            self.assertEqual(ttb.setstat(), ttb.Var.ts_stat)
+            self.assertEqual(
+                sorted(q.answers[0] for q in ttb.Var.ts.sample(2)),
+                ["arctic", "southern"])
+
+        asyncio.run(run())
+
+    def test_failed_reload_keeps_set(self):
+        write_set(self.path, ["pacific"])
+
+        async def run():
+            await ttb.loadset()
+            old_ts = ttb.Var.ts
+            os.remove(self.path)
+            with self.assertRaises(OSError):
+                await ttb.loadset()
+            self.assertIs(ttb.Var.ts, old_ts)
+            self.assertEqual(ttb.Var.ts[0].answers[0], "pacific")
+
+        asyncio.run(run())
+
+class TestStartLoad(unittest.TestCase):
+    def test_failed_load_is_reported(self):
+        self.addCleanup(TestReloadSet.restore, ttb.Var.filename,
+                        ttb.Var.filetype)
+        ttb.Var.filename = os.path.join(tempfile.gettempdir(), "missing")
+        ttb.Var.filetype = "csv"
+        chan = ttb.ChannelVar("#chan", "userscores_chan")
+        sent = []
+
+        async def run():
+            with mock.patch.object(
+                    ttb, "send_msg", lambda chan, msg, *args: sent.append(msg)):
+                ttb.trivia_start(chan)
+                with self.assertRaises(OSError):
+                    await ttb.Var.ts_loading
+
+        asyncio.run(run())
+        self.assertFalse(chan.is_active)
+        self.assertEqual(len(sent), 2)
+        self.assertIn("NOT loaded", sent[-1])
+
+if __name__ == "__main__":
+    unittest.main()
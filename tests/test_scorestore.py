@@ -0,0 +1,177 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+
+import scorestore
+from scorestore import MATCH, OVERALL, SESSION
+
+class TestJsonScoreStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "userscores.txt")
+
+    def open_store(self):
+        store = scorestore.JsonScoreStore(self.path)
+        store.load()
+        return store
+
+    def crash(self, store):
+        # leave the journal behind without compacting, as if the bot
+        # was killed
+        store._journal.close()
+
+    def test_replays_journal_after_crash(self):
+        store = self.open_store()
+        store.add("alice", SESSION, 2)
+        store.add("alice", OVERALL, 2)
+        store.add("bob", MATCH, 1)
+        self.crash(store)
+
+        store = self.open_store()
+        self.assertEqual(store.get("alice"), [2, 2, 0])
+        self.assertEqual(store.get("bob"), [0, 0, 1])
+        store.close()
+
+    def test_replays_clear(self):
+        store = self.open_store()
+        store.add("alice", SESSION, 3)
+        store.clear_session()
+        store.add("bob", SESSION, 1)
+        self.crash(store)
+
+        store = self.open_store()
+        self.assertEqual(store.get("alice")[SESSION], 0)
+        self.assertEqual(store.get("bob")[SESSION], 1)
+        store.close()
+
+    def test_ignores_entry_truncated_mid_line(self):
+        store = self.open_store()
+        store.add("alice", OVERALL, 1)
+        store.add("bob", OVERALL, 1)
+        self.crash(store)
+        with open(store.journal_path, "rb+") as fp:
+            fp.truncate(os.path.getsize(store.journal_path) - 5)
+
+        store = self.open_store()
+        self.assertEqual(store.get("alice")[OVERALL], 1)
+        self.assertNotIn("bob", store.userscores)
+        # the incomplete entry is dropped when the journal is folded in
+        with open(store.journal_path, encoding="utf-8") as fp:
+            self.assertEqual(len(fp.readlines()), 1)
+        store.close()
+
+    def test_skips_journal_of_older_snapshot(self):
+        store = self.open_store()
+        store.add("alice", OVERALL, 1)
+        self.crash(store)
+        with open(store.journal_path, encoding="utf-8") as fp:
+            journal = fp.read()
+        # the snapshot was renamed but the journal not restarted yet
+        store = self.open_store()
+        store.close()
+        with open(store.journal_path, "w", encoding="utf-8") as fp:
+            fp.write(journal)
+
+        store = self.open_store()
+        self.assertEqual(store.get("alice")[OVERALL], 1)
+        store.close()
+
+    def test_close_writes_snapshot(self):
+        store = self.open_store()
+        store.add("alice", OVERALL, 4)
+        store.close()
+        with open(self.path, encoding="utf-8") as fp:
+            self.assertEqual(json.load(fp)["alice"], [0, 4, 0])
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.scores = {}
+        self.board = scorestore.Leaderboard(
+            3, lambda x: (self.scores[x], x))
+
+    def expected(self, count):
+        return sorted(self.scores, key=lambda x: (self.scores[x], x),
+                      reverse=True)[: count]
+
+    def test_matches_full_sort_as_scores_go_up(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            username = f"user{rng.randrange(20)}"
+            self.scores[username] = self.scores.get(username, 0) + 1
+            self.board.update(username)
+            self.assertEqual(self.board.top(3, self.scores), self.expected(3))
+
+    def test_rebuilds_after_invalidate(self):
+        self.scores.update(a=5, b=4, c=3, d=2)
+        self.assertEqual(self.board.top(3, self.scores), ["a", "b", "c"])
+        self.scores["a"] = 0
+        self.board.invalidate()
+        self.assertEqual(self.board.top(3, self.scores), ["b", "c", "d"])
+
+    def test_larger_count_than_board(self):
+        self.scores.update(a=5, b=4, c=3, d=2, e=1)
+        self.assertEqual(self.board.top(5, self.scores), self.expected(5))
+
+    def test_reset(self):
+        self.scores.update(a=5, b=4)
+        self.board.top(3, self.scores)
+        for username in self.scores:
+            self.scores[username] = 0
+        self.board.reset()
+        self.scores["c"] = 1
+        self.board.update("c")
+        self.assertEqual(self.board.top(1, self.scores), ["c"])
+
+class TestJsonScoreStoreLeaderboards(unittest.TestCase):
+    def test_matches_full_sort(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = scorestore.JsonScoreStore(
+                os.path.join(directory, "userscores.txt"),
+                leaderboard_size=3)
+            store.load()
+            rng = random.Random(1)
+            for step in range(300):
+                username = f"user{rng.randrange(10)}"
+                store.add(username, SESSION, 1)
+                store.add(username, OVERALL, 1)
+                if step % 50 == 49:
+                    store.add(username, MATCH, 1)
+                    store.clear_session()
+                ranks = list(store.userscores)
+                session = sorted(
+                    (k for k, v in store.userscores.items() if v[SESSION]),
+                    key=lambda k: (store.userscores[k][SESSION],
+                                   -ranks.index(k)), reverse=True)
+                overall = sorted(
+                    store.userscores,
+                    key=lambda k: (store.userscores[k][MATCH],
+                                   store.userscores[k][OVERALL],
+                                   -ranks.index(k)), reverse=True)
+                self.assertEqual([k for k, _ in store.top_session(3)],
+                                 session[: 3])
+                self.assertEqual([k for k, _, _ in store.top_overall(3)],
+                                 overall[: 3])
+            store.close()
+
+class TestSqliteScoreStore(unittest.TestCase):
+    def test_import_table(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "userscores.db")
+            old = scorestore.SqliteScoreStore(path, table="userscores")
+            old.load()
+            old.add("alice", OVERALL, 3)
+            new = scorestore.SqliteScoreStore(path, table="userscores_chan")
+            new.load()
+            self.assertFalse(new.import_table("missing"))
+            self.assertTrue(new.import_table("userscores"))
+            self.assertEqual(new.get("alice"), [0, 3, 0])
+            # the old table is kept
+            self.assertEqual(old.get("alice"), [0, 3, 0])
+            new.close()
+            old.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import signal
+import sys
+import tempfile
+import time
+import unittest
+
+import supervisor
+
+class TestHashRing(unittest.TestCase):
+    def test_moves_only_keys_of_removed_node(self):
+        keys = [f"#chan{number}" for number in range(1000)]
+        before = supervisor.HashRing(range(4))
+        after = supervisor.HashRing(range(3))
+        for key in keys:
+            if before.node(key) != 3:
+                self.assertEqual(after.node(key), before.node(key))
+
+def worker(code):
+    return [sys.executable, "-c", code]
+
+class TestSupervisor(unittest.TestCase):
+    def test_stop_on_purpose(self):
+        workers = supervisor.Supervisor({
+            0: worker(f"raise SystemExit({supervisor.STOPPED})"),
+            1: worker("import time; time.sleep(60)")})
+        started = time.monotonic()
+        asyncio.run(asyncio.wait_for(workers.run(), 30))
+        self.assertLess(time.monotonic() - started, 30)
+
+    def test_restarts_worker_exiting_cleanly(self):
+        # e.g. a worker sent SIGTERM by something other than the
+        # supervisor; the other workers keep running
+        workers = supervisor.Supervisor({0: worker("pass"),
+                                         1: worker("import time; "
+                                                   "time.sleep(60)")},
+                                        min_backoff=0.01)
+
+        async def run():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(workers.run(), 2)
+
+        asyncio.run(run())
+        self.assertGreater(workers.restarts[0], 0)
+        self.assertEqual(workers.restarts[1], 0)
+
+    def test_restarts_failed_startup(self):
+        workers = supervisor.Supervisor(
+            {0: worker(f"raise SystemExit({supervisor.STARTUP_FAILED})")},
+            min_backoff=0.01)
+
+        async def run():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(workers.run(), 2)
+
+        asyncio.run(run())
+        self.assertGreater(workers.restarts[0], 0)
+
+    @unittest.skipIf(sys.platform == "win32", "no SIGTERM handlers")
+    def test_sigterm_stops_workers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ready = os.path.join(directory, "ready")
+            stopped = os.path.join(directory, "stopped")
+            workers = supervisor.Supervisor({0: worker(
+                "import signal, sys, time\n"
+                "def stop(*args):\n"
+                f"    open({stopped!r}, 'w').close()\n"
+                "    sys.exit(0)\n"
+                "signal.signal(signal.SIGTERM, stop)\n"
+                f"open({ready!r}, 'w').close()\n"
+                "time.sleep(60)\n")})
+
+            async def run():
+                task = asyncio.create_task(workers.run())
+                while not os.path.exists(ready):
+                    await asyncio.sleep(0.01)
+                os.kill(os.getpid(), signal.SIGTERM)
+                await asyncio.wait_for(task, 15)
+
+            asyncio.run(run())
+            self.assertTrue(os.path.exists(stopped))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,27 +3,59 @@
 @author: cleartonic
 """
 
+import time
+
+# Taken before the other imports so that startup can report them
+STARTED = time.perf_counter()
+
+import asyncio
 import collections
 import configparser
-import json
 import logging
-import time
-import os
 import os.path
 import random
-import re
-import socket
-
-import pandas as pd
+import signal
+import sys
 
-from editdistance import DistanceAlgorithm, EditDistance
+import irc
+from matcher import AnswerMatcher
+import metrics
+import questionbank
+import scorestore
+import supervisor
 
 #######################################################################
 # Global
 #######################################################################
 logging.basicConfig(level=logging.INFO)
 LOG = logging.getLogger("TTB")
-POS = ["1st", "2nd", "3rd"]
+
+# Instrumentation, served on metrics_port and logged every
+# metrics_interval seconds
+METRICS = metrics.Registry()
+CHAT_LINES = METRICS.counter("ttb_chat_lines_total",
+                             "Chat lines read from the joined channels")
+MATCH_SECONDS = METRICS.histogram("ttb_match_seconds",
+                                  "Time to match a burst of answers")
+MATCH_TIERS = METRICS.counter("ttb_match_messages_total",
+                              "Answers by the matcher tier that resolved "
+                              "them", label="tier")
+ANSWER_SECONDS = METRICS.histogram(
+    "ttb_answer_seconds", "Time from a question to its first correct answer",
+    metrics.SLOW_BUCKETS)
+DUMP_SECONDS = METRICS.histogram("ttb_dumpscores_seconds",
+                                 "Time to write out the scores of a channel")
+METRICS.gauge("ttb_send_queue_depth", "Chat messages waiting to be sent",
+              function=lambda: queuestat(len))
+METRICS.counter("ttb_messages_sent_total", "Chat messages sent",
+                function=lambda: queuestat(lambda queue: queue.stats["sent"]))
+METRICS.counter("ttb_replies_coalesced_total",
+                "Command replies dropped as already queued",
+                function=lambda: queuestat(
+                    lambda queue: queue.stats["coalesced"]))
+METRICS.gauge("ttb_active_sessions", "Channels playing trivia",
+              function=lambda: sum(chan.is_active
+                                   for chan in Var.channels.values()))
 
 #######################################################################
 # SETTINGS
@@ -48,91 +80,116 @@ class Var:
     # Seconds to wait after previous question is answered before asking
     # next question
     delay = None
-    admins = []
+    # Where scores are kept: "json" (userscores_<channel>.txt) or "sqlite"
+    # (userscores.db)
+    score_backend = "json"
+    # Number of places reported by leaderboards
+    top_count = 3
+    # Seconds between checks of the trivia set file for changes, 0 to
+    # disable
+    reload_interval = 0
+    # Seconds before the same command reply can be repeated in chat,
+    # whoever asks for it
+    global_cooldown = 5
+    # Seconds before a user can use !score or !triviatop3 again
+    user_cooldown = 10
+    # Number of processes the channels are spread over
+    workers = 1
+    # Port of the metrics endpoint (plus the worker index), 0 to disable
+    metrics_port = 0
+    # Seconds between metrics summaries in the log, 0 to disable
+    metrics_interval = 0
+    admins = set()
 
     # FUNCTION VARIABLES
-    # open trivia source based on type
-    if filetype == "csv":
-        ts = pd.read_csv(f"{filename}.{filetype}")
-    if filetype in ("xlsx", "xls"):
-        ts = pd.read_excel(f"{filename}.{filetype}")
-    if filetype not in ("xlsx", "xls", "csv"):
-        LOG.warning("No file loaded. Type !stopbot and try loading again.")
-    # Dynamic # of rows based on triviaset
-    tsrows = ts.shape[0]
-    # Set columns in quizset to same as triviaset
-    qs = pd.DataFrame(columns=ts.columns)
-    # Dictionary holding user scores, kept in '!' and loaded/created
-    # upon trivia. [1,2,3] 1: Session score 2: Total trivia points
-    # 3: Total wins
-    userscores = {}
-    COMMANDLIST = ["!triviastart", "!triviaend", "!triviatop3", "!score",
-                   "!next", "!stop", "!loadconfig"]
+    # Trivia set, loaded in the background once connected
+    ts = None
+    # Future of the trivia set while it is being loaded
+    ts_loading = None
+    # Modification time and size of the trivia set file when loaded
+    ts_stat = None
+    # Game state of each channel: {"#channel": ChannelVar}
+    channels = {}
+    # Index of this process when run as a worker, otherwise None
+    worker = None
+    # Chat commands: {"!name": Command}, filled in by @command
+    COMMANDS = {}
     # Switch to keep bot connection running
     SWITCH = True
-    # Switch for when trivia is being played
-    is_active = False
-    # Switch for when a question is actively being asked
-    question_asked = False
-    # Time when the last question was asked (used for relative time
-    # length for hints/skip)
-    ask_time = 0
-    # 0 = not requested, 1 = first hint requested, 2 = second hint
-    # requested
-    hint_req = 0
-    # Question # in current session
-    q_no = 0
-    # How much each question is worth (altered by BONUS only)
-    ans_val = 1
-    # Ongoing active timer
-    TIMER = 0
-    # Distance comparer
-    comparer = None
+    # Whether the bot was stopped by !stop
+    stopped = False
 
     @classmethod
     def is_admin(cls, username):
         return username in cls.admins
 
-    @classmethod
-    def is_game_over(cls):
-        return cls.num_qs == cls.q_no
-
-    @classmethod
-    def exceed_time(cls, timing):
-        return cls.TIMER - cls.ask_time > timing
-
-    @classmethod
-    def q_category(cls):
-        return cls.qs.iloc[cls.q_no, 0]
-
-    @classmethod
-    def q_question(cls):
-        return cls.qs.iloc[cls.q_no, 1]
-
-    @classmethod
-    def q_answer(cls, offset):
-        return cls.qs.iloc[cls.q_no, 2 + offset]
-
-    @classmethod
-    def user_session(cls, username):
-        return Var.userscores[username][0]
-
-    @classmethod
-    def user_overall(cls, username):
-        return Var.userscores[username][1]
-
-    @classmethod
-    def user_match(cls, username):
-        return Var.userscores[username][2]
-
-    @classmethod
-    def user_add(cls, score_type, username, value):
+# Game state of one channel. The trivia set and the settings above are
+# shared by all channels
+class ChannelVar:
+    def __init__(self, name, scores_name):
+        # Channel name, e.g. "#cleartonic"
+        self.name = name
+        # Scores file name without extension (json) or table (sqlite)
+        self.scores_name = scores_name
+        # Questions for the current session
+        self.qs = []
+        # Total questions of the current session
+        self.num_qs = 0
+        # Store holding user scores, loaded/created upon trivia.
+        # [1,2,3] 1: Session score 2: Total trivia points 3: Total wins
+        self.store = None
+        # Switch for when trivia is being played
+        self.is_active = False
+        # Switch for when a question is actively being asked
+        self.question_asked = False
+        # Time when the last question was asked
+        self.ask_time = 0
+        # 0 = not requested, 1 = first hint requested, 2 = second hint
+        # requested
+        self.hint_req = 0
+        # Question # in current session
+        self.q_no = 0
+        # How much each question is worth (altered by BONUS only)
+        self.ans_val = 1
+        # Pending timer handles for hints, skips and delays
+        self.timers = []
+        # Matcher for the answers of the current question
+        self.matcher = None
+        # Command replies until scores change: {key: [reply, time sent]}
+        self.replies = {}
+        # Users on cooldown for each command, oldest use first:
+        # {command: OrderedDict(user: time)}
+        self.cooldowns = {}
+
+    def is_game_over(self):
+        return self.num_qs == self.q_no
+
+    def q_category(self):
+        return self.qs[self.q_no].category
+
+    def q_question(self):
+        return self.qs[self.q_no].question
+
+    def q_answer(self, offset):
+        return self.qs[self.q_no].answers[offset]
+
+    def user_session(self, username):
+        return self.store.get(username)[scorestore.SESSION]
+
+    def user_overall(self, username):
+        return self.store.get(username)[scorestore.OVERALL]
+
+    def user_match(self, username):
+        return self.store.get(username)[scorestore.MATCH]
+
+    def user_add(self, score_type, username, value):
+        self.replies.clear()
         if score_type == "session":
-            Var.userscores[username][0] += value
+            self.store.add(username, scorestore.SESSION, value)
         elif score_type == "overall":
-            Var.userscores[username][1] += value
+            self.store.add(username, scorestore.OVERALL, value)
         elif score_type == "match":
-            Var.userscores[username][2] += value
+            self.store.add(username, scorestore.MATCH, value)
 
 # Variables for IRC / Twitch chat function
 class ChatVar:
@@ -140,10 +197,21 @@ class ChatVar:
     PORT = None
     NICK = None
     PASS = None
-    CHAN = None
-    # messages per second
-    RATE = 120
-    CHAT_MSG = re.compile(r"^:\w+!\w+@\w+\.tmi\.twitch\.tv PRIVMSG #\w+ :")
+    # Channels to join, e.g. ["#cleartonic"]
+    CHANS = []
+    # Channel that takes over the scores kept before the bot could join
+    # several channels, if any
+    LEGACY_CHAN = None
+    # Chat messages allowed per 30 seconds: 20, or 100 as a moderator
+    # (more for verified bots)
+    MSG_LIMIT = 20
+    # Channels that can be joined per 10 seconds
+    JOIN_LIMIT = 20
+    # asyncio stream pair for the IRC connection
+    reader = None
+    writer = None
+    # Outbound chat messages, paced to MSG_LIMIT
+    queue = None
 
     @classmethod
     def is_bot(cls, username):
@@ -152,22 +220,48 @@ class ChatVar:
 #######################################################################
 # Helper functions
 #######################################################################
-def fuzzy_match(offset, message):
-    tol = 0.4 - 0.15 * Var.hint_req
-    ans = Var.q_answer(offset)
-    dist = Var.comparer.compare(ans.lower(), message.strip().lower(),
-                                2 ** 31 - 1)
-    closeness = dist / len(ans)
-    LOG.info("Distance: %d | Difference: %f | Tolerance %f", dist, closeness,
-             tol)
-    return closeness < tol
-
 def pluralize(count, singular, plural=None):
     if plural is not None:
         return f"{plural if count > 1 else singular}"
     else:
         return f"{singular}{'s' if count > 1 else ''}"
 
+def ordinal(number):
+    suffix = "th"
+    if not 10 <= number % 100 <= 20:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(number % 10, "th")
+    return f"{number}{suffix}"
+
+# A statistic of the send queue, 0 before it exists
+def queuestat(function):
+    return 0 if ChatVar.queue is None else function(ChatVar.queue)
+
+# Run callback(chan, *args) after delay seconds without blocking the
+# chat reader
+def schedule(chan, delay, callback, *args):
+    loop = asyncio.get_running_loop()
+    chan.timers.append(loop.call_later(delay, callback, chan, *args))
+
+def cancel_timers(chan):
+    for timer in chan.timers:
+        timer.cancel()
+    chan.timers.clear()
+
+# Channel names are lowercase and start with "#"; "" stays ""
+def channel_name(name):
+    name = name.strip().lower()
+    if name and not name.startswith("#"):
+        name = f"#{name}"
+    return name
+
+# Scores are kept by channel name, so the order of the channels in the
+# config does not matter
+def scores_name(name):
+    return f"userscores_{name[1:]}"
+
+# Name of the scores kept before the bot could join several channels
+LEGACY_SCORES = "userscores"
+
 #######################################################################
 # Backend code
 #######################################################################
@@ -181,338 +275,715 @@ def loadconfig():
     Var.hint_time_2 = int(config["Trivia"]["hint_time_2"])
     Var.skiptime = int(config["Trivia"]["skiptime"])
     Var.delay = int(config["Trivia"]["delay"])
-
-    Var.admins = config["Admin"]["admins"].split(",")
+    Var.score_backend = config["Trivia"].get("score_backend",
+                                             fallback="json")
+    Var.top_count = config["Trivia"].getint("top_count", fallback=3)
+    Var.reload_interval = config["Trivia"].getint("reload_interval",
+                                                  fallback=0)
+    Var.user_cooldown = config["Trivia"].getint("user_cooldown",
+                                                fallback=10)
+    Var.global_cooldown = config["Trivia"].getint("global_cooldown",
+                                                  fallback=5)
+    for chan in Var.channels.values():
+        chan.replies.clear()
+
+    # Twitch sends usernames in lowercase
+    Var.admins = {admin.strip().lower()
+                  for admin in config["Admin"]["admins"].split(",")}
 
     ChatVar.HOST = config["Bot"]["HOST"]
     ChatVar.PORT = int(config["Bot"]["PORT"])
     ChatVar.NICK = config["Bot"]["NICK"]
     ChatVar.PASS = config["Bot"]["PASS"]
-    ChatVar.CHAN = config["Bot"]["CHAN"]
-
-def loadscores():
-    if os.path.exists("userscores.txt"):
-        with open("userscores.txt", "r") as fp:
-            LOG.info("Score list loaded.")
-            Var.userscores = json.load(fp)
+    # Channels are comma separated; changes apply on restart
+    ChatVar.CHANS = []
+    for name in config["Bot"]["CHAN"].split(","):
+        name = channel_name(name)
+        if name and name not in ChatVar.CHANS:
+            ChatVar.CHANS.append(name)
+    # The old scores belong to the only channel, or must be assigned
+    ChatVar.LEGACY_CHAN = channel_name(
+        config["Bot"].get("legacy_channel", fallback="")) or None
+    if ChatVar.LEGACY_CHAN is None and len(ChatVar.CHANS) == 1:
+        ChatVar.LEGACY_CHAN = ChatVar.CHANS[0]
+    moderator = config["Bot"].getboolean("moderator", fallback=False)
+    ChatVar.MSG_LIMIT = config["Bot"].getint("msg_limit",
+                                             fallback=100 if moderator else 20)
+    ChatVar.JOIN_LIMIT = config["Bot"].getint("join_limit", fallback=20)
+    Var.workers = config["Bot"].getint("workers", fallback=1)
+    Var.metrics_port = config["Bot"].getint("metrics_port", fallback=0)
+    Var.metrics_interval = config["Bot"].getint("metrics_interval",
+                                                fallback=0)
+    if Var.workers > 1:
+        # Twitch's limits are per account, so workers split them
+        ChatVar.MSG_LIMIT = max(1, ChatVar.MSG_LIMIT // Var.workers)
+        ChatVar.JOIN_LIMIT = max(1, ChatVar.JOIN_LIMIT // Var.workers)
+    if ChatVar.queue is not None:
+        ChatVar.queue.limiter.limit = ChatVar.MSG_LIMIT
+
+# Set up the game state and scores of every channel, or of the
+# channels of this worker
+def loadchannels():
+    ring = supervisor.HashRing(range(Var.workers))
+    for name in ChatVar.CHANS:
+        if Var.worker is not None and ring.node(name) != Var.worker:
+            continue
+        chan = ChannelVar(name, scores_name(name))
+        loadscores(chan)
+        Var.channels[name] = chan
+    if (ChatVar.LEGACY_CHAN is None and Var.worker in (None, 0)
+            and os.path.exists(f"{LEGACY_SCORES}.txt")):
+        LOG.warning("'%s.txt' is not used by any channel; set "
+                    "legacy_channel to keep its scores.", LEGACY_SCORES)
+
+def loadscores(chan):
+    json_path = f"{chan.scores_name}.txt"
+    legacy = chan.name == ChatVar.LEGACY_CHAN
+    if Var.score_backend == "sqlite":
+        # Workers share the database, so none may hold its lock for
+        # long
+        chan.store = scorestore.SqliteScoreStore(
+            "userscores.db", commit_every=1 if Var.workers > 1 else 50,
+            table=chan.scores_name)
+        if chan.store.load():
+            LOG.info("%s: Score database loaded.", chan.name)
+            return
+        LOG.info("%s: No score database, creating...", chan.name)
+        if legacy and chan.store.import_table(LEGACY_SCORES):
+            LOG.info("%s: Imported scores from table '%s'.", chan.name,
+                     LEGACY_SCORES)
+            return
+        if legacy and not os.path.exists(json_path):
+            json_path = f"{LEGACY_SCORES}.txt"
+        if os.path.exists(json_path):
+            LOG.info("%s: Importing scores from '%s'...", chan.name,
+                     json_path)
+            json_store = scorestore.JsonScoreStore(json_path)
+            json_store.load()
+            chan.store.import_scores(json_store.userscores)
+            json_store.close()
     else:
-        with open("userscores.txt", "w") as fp:
-            LOG.info("No score list, creating...")
-            Var.userscores = {"trivia_dummy": [0, 0, 0]}
-            json.dump(Var.userscores, fp)
-
-def dumpscores():
+        if (legacy and not os.path.exists(json_path)
+                and os.path.exists(f"{LEGACY_SCORES}.txt")):
+            migratescores(chan, json_path)
+        chan.store = scorestore.JsonScoreStore(
+            json_path, leaderboard_size=Var.top_count)
+        if chan.store.load():
+            LOG.info("%s: Score list loaded.", chan.name)
+        else:
+            LOG.info("%s: No score list, creating...", chan.name)
+
+# Move the scores kept before the bot could join several channels to
+# the channel's own file. The journal goes first, so that a move cut
+# short is finished on the next start
+def migratescores(chan, json_path):
+    LOG.info("%s: Moving scores from '%s.txt' to '%s'...", chan.name,
+             LEGACY_SCORES, json_path)
+    legacy_path = f"{LEGACY_SCORES}.txt"
+    if os.path.exists(f"{legacy_path}.journal"):
+        os.replace(f"{legacy_path}.journal", f"{json_path}.journal")
+    os.replace(legacy_path, json_path)
+
+# Score changes are persisted as they happen; this makes sure all of
+# them are written out
+def dumpscores(chan):
+    started = time.perf_counter()
     try:
-        with open("userscores.txt", "w") as fp:
-            json.dump(Var.userscores, fp)
+        chan.store.compact()
     except:
-        LOG.error("Scores NOT saved!")
-
-def build_session_quizset():
-    # Create a list of all indices
-    row_list = list(range(Var.tsrows))
-    num_qs = 0
-    while num_qs < Var.num_qs:
-        row_idx = random.choice(row_list)
-        row_list.remove(row_idx)
-        try:
-            # Check for duplicates with last argument, skip if so
-            Var.qs = Var.qs.append(Var.ts.loc[row_idx],
-                                   verify_integrity=True)
-            num_qs += 1
-        except:
-            # pass on duplicates and re-roll
-            LOG.war("Duplicate index. This should not happen, dropping row "
-                    "from table. Please check config.txt's questions "
-                    "are <= total # of questions in trivia set.")
-            Var.ts.drop(Var.ts.index[[row_idx]])
-    LOG.info("Quizset built.")
+        LOG.error("%s: Scores NOT saved!", chan.name)
+    DUMP_SECONDS.observe(time.perf_counter() - started)
+
+# Load the trivia set in a worker thread so chat keeps being read.
+# Returns the future of the load
+def loadset():
+    if Var.ts_loading is None:
+        started = time.perf_counter()
+        Var.ts_stat = setstat()
+        Var.ts_loading = asyncio.get_running_loop().run_in_executor(
+            None, questionbank.load, Var.filename, Var.filetype)
+        Var.ts_loading.add_done_callback(
+            lambda future: loadset_done(future, started))
+    return Var.ts_loading
+
+def loadset_done(future, started):
+    Var.ts_loading = None
+    try:
+        ts = future.result()
+    except (OSError, ValueError, ImportError):
+        if Var.ts is None:
+            LOG.error("Trivia set not loaded! Check config file and try "
+                      "!triviastart again")
+        else:
+            LOG.error("Trivia set not reloaded! Keeping the current one.")
+        return
+    # Running sessions play from their own quizsets, so swapping the
+    # set here never disturbs them
+    old_ts, Var.ts = Var.ts, ts
+    if old_ts is not None:
+        old_ts.close()
+    LOG.info("Trivia set loaded: %d questions in %.3fs", len(Var.ts),
+             time.perf_counter() - started)
+
+# Modification time and size of the trivia set file, or None if it
+# is missing
+def setstat():
+    try:
+        stat = os.stat(f"{Var.filename}.{Var.filetype}")
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+# Reload the trivia set whenever its file changes
+async def watchset():
+    while True:
+        await asyncio.sleep(max(Var.reload_interval, 1))
+        if (Var.reload_interval > 0 and Var.ts is not None
+                and setstat() != Var.ts_stat):
+            LOG.info("Trivia set file changed, reloading...")
+            loadset()
+
+def build_session_quizset(chan):
+    # Draw num_qs distinct questions in one call
+    chan.qs = Var.ts.sample(chan.num_qs)
+    LOG.info("%s: Quizset built.", chan.name)
 
 #######################################################################
 # CODE
 #######################################################################
+# A chat command: handler(chan, username) is run when the command is
+# used. Admin commands are ignored from other users, and a command with
+# a cooldown can be used by each user once per cooldown seconds
+# (USER_COOLDOWN for the user_cooldown setting)
+class Command:
+    def __init__(self, handler, admin=False, cooldown=0.0):
+        self.handler = handler
+        self.admin = admin
+        self.cooldown = cooldown
+
+# Decorator registering a handler as a chat command, e.g.
+# @command("!hello") above def hello(chan, username)
+def command(name, admin=False, cooldown=0.0):
+    def register(handler):
+        Var.COMMANDS[name] = Command(handler, admin, cooldown)
+        return handler
+    return register
+
+# Cooldown of a command that follows the user_cooldown setting, looked
+# up when the command is used so that !loadconfig changes it
+USER_COOLDOWN = object()
+
 # Trivia command switcher
-def trivia_commandswitch(cleanmessage, username):
-    # ADMIN ONLY COMMANDS
-    if Var.is_admin(username):
-        if cleanmessage == "!triviastart":
-            if Var.is_active:
-                LOG.info("Trivia already active.")
-            else:
-                trivia_start()
-        elif cleanmessage == "!triviaend" and Var.is_active:
-            trivia_end()
-        elif cleanmessage == "!stop":
-            stopbot()
-        elif cleanmessage == "!loadconfig":
-            loadconfig()
-            send_msg("Config reloaded.")
-        elif cleanmessage == "!next":
-            trivia_skipquestion()
-
-    # GLOBAL COMMANDS
-    if cleanmessage == "!score":
-        trivia_score(username)
-    elif cleanmessage == "!triviatop3":
-        topscore = trivia_top3overall()
-
-        msg = "No scores yet."
-        if topscore:
-            msg = " ".join(f"{POS[i]} place: {score[0]} {score[1]} "
-                           f"{pluralize(score[1], 'match', 'matches')} | "
-                           f"{score[2]} {pluralize(score[2], 'point')}."
-                           for i, score in enumerate(topscore))
-        send_msg(msg)
+def trivia_commandswitch(chan, cleanmessage, username):
+    cmd = Var.COMMANDS[cleanmessage]
+    if cmd.admin and not Var.is_admin(username):
+        return
+    cooldown = cmd.cooldown
+    if cooldown is USER_COOLDOWN:
+        cooldown = Var.user_cooldown
+    if cooldown and not cooldown_passed(chan, username, cleanmessage,
+                                        cooldown):
+        return
+    # A handler returns False if it did not reply, which does not count
+    # as a use
+    if cmd.handler(chan, username) is False and cooldown:
+        chan.cooldowns[cleanmessage].pop(username, None)
+
+# ADMIN ONLY COMMANDS
+@command("!triviastart", admin=True)
+def command_triviastart(chan, username):
+    trivia_start(chan)
+
+@command("!triviaend", admin=True)
+def command_triviaend(chan, username):
+    if chan.is_active:
+        trivia_end(chan)
+
+@command("!stop", admin=True)
+def command_stop(chan, username):
+    stopbot()
+
+@command("!loadconfig", admin=True)
+def command_loadconfig(chan, username):
+    trivia_set = (Var.filename, Var.filetype)
+    loadconfig()
+    send_msg(chan, "Config reloaded.", irc.REPLY)
+    if (Var.filename, Var.filetype) != trivia_set:
+        trivia_reloadset(chan)
+
+@command("!reloadset", admin=True)
+def command_reloadset(chan, username):
+    trivia_reloadset(chan)
+
+@command("!next", admin=True)
+def command_next(chan, username):
+    trivia_skipquestion(chan)
+
+# GLOBAL COMMANDS
+@command("!score", cooldown=USER_COOLDOWN)
+def command_score(chan, username):
+    return send_reply(chan, ("!score", username),
+                      lambda: trivia_score(chan, username))
+
+@command("!triviatop3", cooldown=USER_COOLDOWN)
+def command_triviatop3(chan, username):
+    return send_reply(chan, ("!triviatop3",), lambda: trivia_top3(chan))
+
+# Returns whether the user's cooldown for the command is over, and
+# starts a new one if so
+def cooldown_passed(chan, username, command, cooldown):
+    now = time.monotonic()
+    users = chan.cooldowns.get(command)
+    if users is None:
+        users = chan.cooldowns[command] = collections.OrderedDict()
+    # Uses are added in time order, so expired ones are at the front
+    while users and now - next(iter(users.values())) >= cooldown:
+        users.popitem(last=False)
+    if username in users:
+        return False
+    users[username] = now
+    return True
+
+# Send a command reply and return whether it was sent. Replies are built
+# once and reused until scores change, and the same reply is not
+# repeated within global_cooldown
+def send_reply(chan, key, build):
+    now = time.monotonic()
+    reply = chan.replies.get(key)
+    if reply is None:
+        reply = chan.replies[key] = [build(), None]
+    elif reply[1] is not None and now - reply[1] < Var.global_cooldown:
+        return False
+    reply[1] = now
+    send_msg(chan, reply[0], irc.REPLY)
+    return True
 
 # Trivia start build. ts = "Trivia set" means original master trivia
 # file. qs = "Quiz set" means what's going to be played with for the
 # session
-def trivia_start():
-    send_msg("Generating trivia questions for session...")
-    trivia_clearscores()
-
+def trivia_start(chan):
+    if chan.is_active:
+        LOG.info("%s: Trivia already active.", chan.name)
+        return
+    # Messages still pending from the end of the last session must not
+    # fire into the new one
+    cancel_timers(chan)
+    if Var.ts is None:
+        send_msg(chan, "Loading trivia questions...")
+        loadset().add_done_callback(
+            lambda future: trivia_startloaded(chan))
+        return
     # Loop through TS and build QS until num_qs = trivia_numbers
-    if Var.tsrows < Var.num_qs:
-        Var.num_qs = Var.tsrows
+    chan.num_qs = Var.num_qs
+    if len(Var.ts) < chan.num_qs:
+        chan.num_qs = len(Var.ts)
         LOG.warning("Trivia questions for session exceeds trivia set's "
                     "population. Setting session equal to max questions.")
-    build_session_quizset()
-    Var.is_active = True
-    Var.comparer = EditDistance(DistanceAlgorithm.DAMERUAUOSA)
-    send_msg(f"Trivia has begun! Question Count: {Var.num_qs}. "
-             f"Trivia will start in {Var.delay} seconds.")
-    time.sleep(Var.delay)
-    trivia_callquestion()
+    if chan.num_qs <= 0:
+        LOG.warning("%s: No trivia questions to play, not starting.",
+                    chan.name)
+        send_msg(chan, "No trivia questions to play. Trivia NOT started.")
+        return
+    send_msg(chan, "Generating trivia questions for session...")
+    trivia_clearscores(chan)
+    build_session_quizset(chan)
+    chan.is_active = True
+    send_msg(chan, f"Trivia has begun! Question Count: {chan.num_qs}. "
+                   f"Trivia will start in {Var.delay} seconds.")
+    schedule(chan, Var.delay, trivia_callquestion)
+
+def trivia_startloaded(chan):
+    if Var.ts is None:
+        send_msg(chan, "Trivia questions NOT loaded! Check the config "
+                       "file and try !triviastart again.")
+    else:
+        trivia_start(chan)
+
+# Load the trivia set again in the background; it replaces the current
+# one once loaded, and running sessions keep their questions
+def trivia_reloadset(chan):
+    send_msg(chan, "Reloading trivia questions...", irc.REPLY)
+    loadset().add_done_callback(
+        lambda future: trivia_setreloaded(chan, future))
+
+def trivia_setreloaded(chan, future):
+    if future.exception() is not None:
+        send_msg(chan,
+                 "Trivia questions NOT reloaded, keeping the current ones.",
+                 irc.REPLY)
+        return
+    msg = f"Trivia questions reloaded: {len(Var.ts)} questions."
+    if chan.is_active:
+        msg += " They will be used from the next trivia session."
+    send_msg(chan, msg, irc.REPLY)
 
 # Call trivia question
-def trivia_callquestion():
-    Var.question_asked = True
-    Var.ask_time = round(time.time())
-
-    q_no = Var.q_no + 1
-    send_msg(f"Question {q_no}: [{Var.q_category()}] {Var.q_question()}")
-
-    LOG.info("Question %d: %s | ANSWER: %s", q_no, Var.q_question(),
-             Var.q_answer(0))
-
-def trivia_answer(username):
-    Var.question_asked = False
-    try:
-        Var.user_add("session", username, Var.ans_val)
-        Var.user_add("overall", username, Var.ans_val)
-    except:
-        LOG.warning("Failed to find user! Adding new")
-        # sets up new user
-        Var.userscores[username] = [Var.ans_val, Var.ans_val, 0]
-    # Save all current scores
-    dumpscores()
-    send_msg(f"{username} answers question #{Var.q_no + 1} "
-             f"correctly! The answer is ** {Var.q_answer(0)} ** "
-             f"{username} has {Var.user_session(username)} "
-             f"{pluralize(Var.user_session(username), 'point')}!")
-    time.sleep(Var.delay)
-    Var.q_no += 1
-    Var.hint_req = 0
-    Var.question_asked = False
-    Var.ask_time = 0
-
-    if Var.is_game_over():
-        trivia_end()
+def trivia_callquestion(chan):
+    chan.matcher = AnswerMatcher([chan.q_answer(0), chan.q_answer(1)])
+    chan.question_asked = True
+    chan.ask_time = time.time()
+
+    q_no = chan.q_no + 1
+    send_msg(chan,
+             f"Question {q_no}: [{chan.q_category()}] {chan.q_question()}")
+
+    LOG.info("%s: Question %d: %s | ANSWER: %s", chan.name, q_no,
+             chan.q_question(), chan.q_answer(0))
+    schedule(chan, Var.hint_time_1, trivia_askhint, 0)  # Ask first hint
+    schedule(chan, Var.hint_time_2, trivia_askhint, 1)  # Ask second hint
+    schedule(chan, Var.skiptime, trivia_skipquestion)
+
+# Ask the next question, or end trivia once all questions are used
+def trivia_nextquestion(chan):
+    if chan.is_game_over():
+        trivia_end(chan)
     else:
-        LOG.info("Next question called...")
-        trivia_callquestion()
-
-# Finishes trivia by getting top 3 list, then adjusting final message
+        LOG.info("%s: Next question called...", chan.name)
+        trivia_callquestion(chan)
+
+def trivia_answer(chan, username):
+    ANSWER_SECONDS.observe(time.time() - chan.ask_time)
+    chan.question_asked = False
+    cancel_timers(chan)
+    trivia_matchstats(chan)
+    chan.user_add("session", username, chan.ans_val)
+    chan.user_add("overall", username, chan.ans_val)
+    send_msg(chan, f"{username} answers question #{chan.q_no + 1} "
+                   f"correctly! The answer is ** {chan.q_answer(0)} ** "
+                   f"{username} has {chan.user_session(username)} "
+                   f"{pluralize(chan.user_session(username), 'point')}!")
+    chan.q_no += 1
+    chan.hint_req = 0
+    chan.ask_time = 0
+    schedule(chan, Var.delay, trivia_nextquestion)
+
+# Finishes trivia by getting top list, then adjusting final message
 # based on how many participants. Then dumpscore()
-def trivia_end():
-    # Argument "1" will return the first in the list (0th position) for
-    # list of top 3
-    topscore = trivia_top3session()
-    trivia_clearscores()
+def trivia_end(chan):
+    cancel_timers(chan)
+    # A question left open by !triviaend was matched against too
+    if chan.question_asked:
+        trivia_matchstats(chan)
+    topscore = trivia_topsession(chan)
+    trivia_clearscores(chan)
     msg = "No answered questions. Results are blank."
+    delay = 0
     if topscore:
-        send_msg("Trivia is over! Calculating scores...")
-        time.sleep(2)
-        trivia_assignwinner(topscore[0][0])
+        send_msg(chan, "Trivia is over! Calculating scores...")
+        delay = 2
+        trivia_assignwinner(chan, topscore[0][0])
         msg = "*** {} *** is the winner with {} points!".format(*topscore[0])
         for i, score in enumerate(topscore):
             if i > 0:
-                msg += " {} place: {} {} points.".format(POS[i], *score)
-    send_msg(msg)
+                msg += " {} place: {} {} points.".format(ordinal(i + 1),
+                                                         *score)
+    schedule(chan, delay, send_msg, msg)
 
-    dumpscores()
-    time.sleep(3)
-    send_msg("Thanks for playing! See you next time!")
+    dumpscores(chan)
+    schedule(chan, delay + 3, send_msg,
+             "Thanks for playing! See you next time!")
 
     # reset variables for trivia
-    Var.q_no = 0
-    Var.is_active = False
-    Var.comparer = None
-    Var.hint_req = 0
-    Var.question_asked = False
-    Var.ask_time = 0
-    Var.qs = pd.DataFrame(columns=Var.ts.columns)
-
-# after every time loop, routine checking of various vars/procs
-def trivia_routinechecks():
-    Var.TIMER = round(time.time())
-
-    if Var.is_game_over():
-        trivia_end()
-
-    if Var.is_active and Var.question_asked:
-        if Var.hint_req == 0 and Var.exceed_time(Var.hint_time_1):
-            Var.hint_req = 1
-            trivia_askhint(0)  # Ask first hint
-        elif Var.hint_req == 1 and Var.exceed_time(Var.hint_time_2):
-            Var.hint_req = 2
-            trivia_askhint(1)  # Ask second hint
-        elif Var.exceed_time(Var.skiptime):
-            trivia_skipquestion()
+    chan.q_no = 0
+    chan.is_active = False
+    chan.matcher = None
+    chan.hint_req = 0
+    chan.question_asked = False
+    chan.ask_time = 0
+    chan.qs = []
 
 # hinttype: 0 = 1st hint, 1 = 2nd hint
-def trivia_askhint(hinttype=0):
-    prehint = Var.q_answer(0)
+def trivia_askhint(chan, hinttype=0):
+    prehint = chan.q_answer(0)
     hint_no = hinttype + 1
+    chan.hint_req = hint_no
     n = len(prehint)
     idx = random.sample(range(n), k=hint_no * n // 3)
     hint = "".join(c if i in idx or not c.isalnum() else "_"
                    for i, c in enumerate(prehint))
-    send_msg(f"Hint #{hint_no}: {hint}")
+    send_msg(chan, f"Hint #{hint_no}: {hint}")
 
-def trivia_skipquestion():
-    if Var.is_active:
+def trivia_skipquestion(chan):
+    if chan.is_active and chan.question_asked:
+        cancel_timers(chan)
+        trivia_matchstats(chan)
         try:
-            send_msg("Question was not answered in time. Answer: "
-                     f"{Var.q_answer(0)}. Skipping to next question")
+            send_msg(chan, "Question was not answered in time. Answer: "
+                           f"{chan.q_answer(0)}. Skipping to next question")
         except:
-            send_msg("Question was not answered in time. Skipping to next "
-                     "question")
-        Var.q_no += 1
-        Var.hint_req = 0
-        Var.question_asked = False
-        Var.ask_time = 0
-        time.sleep(Var.delay)
-
-        if Var.is_game_over():
-            trivia_end()
-        else:
-            trivia_callquestion()
-
-# Top 3 trivia (session)
-def trivia_top3session():
-    # temp dictionary just for keys & sessionscore
-    scores = {i: Var.user_session(i)
-              for i in Var.userscores if Var.user_session(i) > 0}
-    score_counter = collections.Counter(scores)
-    # top 3 list
-    top3 = [[k, v] for k, v in score_counter.most_common(3)]
-    return top3
-
-# Top 3 trivia (overall)
-def trivia_top3overall():
-    scores = sorted(Var.userscores,
-                    key=lambda x: (Var.user_match(x), Var.user_overall(x)),
-                    reverse=True)
-    top3 = [[k, Var.user_match(k), Var.user_overall(k)]
-            for k in (scores[: 3] if len(scores) > 3 else scores)]
-    return top3
+            send_msg(chan, "Question was not answered in time. Skipping to "
+                           "next question")
+        chan.q_no += 1
+        chan.hint_req = 0
+        chan.question_asked = False
+        chan.ask_time = 0
+        schedule(chan, Var.delay, trivia_nextquestion)
+
+# Log and record how the answers to a question were matched
+def trivia_matchstats(chan):
+    LOG.info("%s: Answer matching: %s", chan.name, dict(chan.matcher.stats))
+    for tier, count in chan.matcher.stats.items():
+        MATCH_TIERS.inc(count, tier)
+
+# Award the question to the first correct answer in a burst of
+# (username, message) pairs
+def trivia_checkanswers(chan, answers):
+    if answers and chan.is_active and chan.question_asked:
+        started = time.perf_counter()
+        index = chan.matcher.match_first(
+            [message for _, message in answers], chan.hint_req)
+        MATCH_SECONDS.observe(time.perf_counter() - started)
+        if index >= 0:
+            LOG.info("%s: Answer recognized.", chan.name)
+            trivia_answer(chan, answers[index][0])
+
+# Top trivia (session)
+def trivia_topsession(chan):
+    return chan.store.top_session(Var.top_count)
+
+# Top trivia (overall)
+def trivia_topoverall(chan):
+    return chan.store.top_overall(Var.top_count)
 
 # clears scores and assigns a win to winner
-def trivia_clearscores():
-    for i in Var.userscores:
-        Var.userscores[i][0] = 0
+def trivia_clearscores(chan):
+    chan.store.clear_session()
+    chan.replies.clear()
 
 # Add +1 to winner's win in userscores
-def trivia_assignwinner(winner):
-    Var.user_add("match", winner, 1)
+def trivia_assignwinner(chan, winner):
+    chan.user_add("match", winner, 1)
 
-def trivia_score(username):
+def trivia_score(chan, username):
     try:
-        send_msg(
-            "{} has {} points for this trivia session, {} total points and "
-            "{} total wins.".format(username, *Var.userscores[username]))
+        return ("{} has {} points for this trivia session, {} total points "
+                "and {} total wins.".format(username,
+                                            *chan.store.get(username)))
     except KeyError:
-        send_msg(f"{username} not found in database.")
-
-# Chat message sender func
-def send_msg(msg):
-    s.send(":{0}!{0}@{0}.tmi.twitch.tv PRIVMSG {1} : {2}\r\n".format(
-        ChatVar.NICK, ChatVar.CHAN, msg).encode("utf-8"))
+        return f"{username} not found in database."
+
+def trivia_top3(chan):
+    topscore = trivia_topoverall(chan)
+    if not topscore:
+        return "No scores yet."
+    return " ".join(f"{ordinal(i + 1)} place: {score[0]} {score[1]} "
+                    f"{pluralize(score[1], 'match', 'matches')} | "
+                    f"{score[2]} {pluralize(score[2], 'point')}."
+                    for i, score in enumerate(topscore))
+
+# Raw IRC line sender func
+def send_raw(line):
+    ChatVar.writer.write(f"{line}\r\n".encode("utf-8"))
+
+# Chat message sender func. Messages are queued to stay within
+# Twitch's rate limit; game messages go before command replies
+def send_msg(chan, msg, priority=irc.GAME):
+    ChatVar.queue.put(":{0}!{0}@{0}.tmi.twitch.tv PRIVMSG {1} : {2}".format(
+        ChatVar.NICK, chan.name, msg), priority)
 
 # STOP BOT (sets loop to false)
 def stopbot():
     Var.SWITCH = False
+    Var.stopped = True
 
 #######################################################################
 # CHAT & BOT CONNECT
 #######################################################################
-def scanloop():
-    try:
-        response = s.recv(1024).decode("utf-8")
-        if response == "PING :tmi.twitch.tv\r\n":
-            s.send("PONG :tmi.twitch.tv\r\n".encode("utf-8"))
-            LOG.info("Pong sent")
-            return
-        username = re.search(r"\w+", response).group(0)
-        # if ChatVar.is_bot(username):  # Ignore this bot's messages
-        #     return
-        message = ChatVar.CHAT_MSG.sub("", response)
-        cleanmessage = re.sub(r"\s+", "", message, flags=re.UNICODE)
-        LOG.info("USER RESPONSE: %s : %s", username, message)
-        if cleanmessage in Var.COMMANDLIST:
-            LOG.info("Command recognized.")
-            trivia_commandswitch(cleanmessage, username)
-            time.sleep(1)
-        else:
+async def scanloop():
+    async for lines in irc.read_lines(ChatVar.reader):
+        # Answers from one read are matched together per channel, so
+        # the earliest correct one wins
+        answers = {}
+        for response in lines:
             try:
-                if fuzzy_match(0, message):
-                    LOG.info("Answer recognized.")
-                    trivia_answer(username)
-                if fuzzy_match(1, message):
-                    LOG.info("Answer recognized.")
-                    trivia_answer(username)
+                chat = handle_line(response)
+                if chat is None:
+                    continue
+                chan, username, message, cleanmessage = chat
+                if cleanmessage in Var.COMMANDS:
+                    LOG.debug("Command recognized.")
+                    trivia_checkanswers(chan, answers.pop(chan, None))
+                    trivia_commandswitch(chan, cleanmessage, username)
+                else:
+                    answers.setdefault(chan, []).append((username, message))
             except:
                 pass
-    except:
+            if not Var.SWITCH:
+                return
+        for chan, chan_answers in answers.items():
+            trivia_checkanswers(chan, chan_answers)
+    LOG.warning("Connection closed by server.")
+
+# Returns (chan, username, message, cleanmessage) for chat lines in
+# the joined channels; cleanmessage is "" unless it may be a command
+def handle_line(response):
+    line = irc.Message.parse(response)
+    if line.command == "PING":
+        send_raw(f"PONG :{line.trailing}")
+        LOG.debug("Pong sent")
+        return None
+    # Only chat can hold answers and commands, not JOIN, USERNOTICE, ...
+    if line.command != "PRIVMSG" or len(line.params) < 2:
+        return None
+    chan = Var.channels.get(line.channel)
+    username = line.nick
+    if chan is None or username is None:
+        return None
+    CHAT_LINES.inc()
+    # if ChatVar.is_bot(username):  # Ignore this bot's messages
+    #     return None
+    message = line.trailing
+    # Only messages starting with "!" can be commands
+    cleanmessage = ("".join(message.split())
+                    if message.lstrip().startswith("!") else "")
+    LOG.debug("USER RESPONSE: %s %s : %s", chan.name, username, message)
+    return chan, username, message, cleanmessage
+
+# Log a summary of the metrics every metrics_interval seconds
+async def dumpmetrics():
+    last_time = time.monotonic()
+    last_lines = CHAT_LINES.value()
+    while True:
+        await asyncio.sleep(max(Var.metrics_interval, 1))
+        if Var.metrics_interval <= 0:
+            continue
+        now = time.monotonic()
+        lines = CHAT_LINES.value()
+        LOG.info("Metrics: %.1f lines/s | %s",
+                 (lines - last_lines) / (now - last_time), METRICS.summary())
+        last_time, last_lines = now, lines
+
+# JOIN every channel, paced to Twitch's limit, and greet each one
+async def joinchannels():
+    loop = asyncio.get_running_loop()
+    limiter = irc.RateLimiter(ChatVar.JOIN_LIMIT, 10)
+    for chan in Var.channels.values():
+        wait = limiter.delay(loop.time())
+        if wait > 0:
+            await asyncio.sleep(wait)
+        limiter.spend(loop.time())
+        send_raw(f"JOIN {chan.name}")
+        loop.call_later(1, send_msg, chan, Var.info_msg, irc.REPLY)
+    LOG.info("Startup: joined %d channels %.3fs after launch",
+             len(Var.channels), time.perf_counter() - STARTED)
+
+async def main():
+    started = time.perf_counter()
+    try:
+        ChatVar.reader, ChatVar.writer = await asyncio.open_connection(
+            ChatVar.HOST, ChatVar.PORT)
+    except OSError:
+        LOG.error("Connection failed. Check config settings and reload bot.")
+        return
+    ChatVar.queue = irc.SendQueue(send_raw, ChatVar.MSG_LIMIT)
+    sender = asyncio.create_task(ChatVar.queue.run())
+    send_raw(f"PASS {ChatVar.PASS}")
+    send_raw(f"NICK {ChatVar.NICK}")
+    log_startup("connect", started)
+    joiner = asyncio.create_task(joinchannels())
+    dumper = asyncio.create_task(dumpmetrics())
+    if Var.metrics_port > 0:
+        port = Var.metrics_port + (Var.worker or 0)
+        try:
+            await metrics.start_server(METRICS, port)
+            LOG.info("Metrics served on http://127.0.0.1:%d/", port)
+        except OSError:
+            LOG.error("Metrics not served, port %d is not available.", port)
+    # The trivia set is only needed at !triviastart
+    loadset()
+    watcher = asyncio.create_task(watchset())
+    # Scan messages until the bot is stopped; hints, skips and delays
+    # run as timers on the same event loop
+    scanner = asyncio.create_task(scanloop())
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM,
+                                                      scanner.cancel)
+    except (NotImplementedError, RuntimeError):
         pass
+    try:
+        await scanner
+    except asyncio.CancelledError:
+        LOG.info("Terminated.")
+        Var.SWITCH = False
+    joiner.cancel()
+    dumper.cancel()
+    watcher.cancel()
+    for chan in Var.channels.values():
+        cancel_timers(chan)
+    try:
+        await asyncio.wait_for(ChatVar.queue.join(), 5)
+    except asyncio.TimeoutError:
+        LOG.warning("%d chat messages not sent.", len(ChatVar.queue))
+    sender.cancel()
+    LOG.info("Chat messages: %s", dict(ChatVar.queue.stats))
+    for chan in Var.channels.values():
+        dumpscores(chan)
+    ChatVar.writer.close()
+
+# Run one worker process per group of channels, chosen by a consistent
+# hash of the channel name, and restart workers that crash. The trivia
+# set is prepared first so that workers only map the cached files
+async def superviseworkers():
+    try:
+        questionbank.load(Var.filename, Var.filetype).close()
+    except (OSError, ValueError, ImportError):
+        LOG.error("Trivia set not loaded! Workers will try again.")
+    ring = supervisor.HashRing(range(Var.workers))
+    shards = {}
+    for name in ChatVar.CHANS:
+        shards.setdefault(ring.node(name), []).append(name)
+    for worker, names in sorted(shards.items()):
+        LOG.info("Worker %d: %d channels", worker, len(names))
+    commands = {worker: [sys.executable, os.path.abspath(__file__),
+                         "--worker", str(worker)]
+                for worker in sorted(shards)}
+    await supervisor.Supervisor(commands).run()
+
+def log_startup(step, started):
+    now = time.perf_counter()
+    LOG.info("Startup: %s took %.3fs", step, now - started)
+    return now
 
 # STARTING PROCEDURES
-LOG.info("Bot started. Loading config and scores...")
-try:
-    loadconfig()
-    LOG.info("Config loaded.")
-except (KeyError, ValueError):
-    LOG.error("Config not loaded! Check config file and reboot bot")
-    Var.SWITCH = False
-
-try:
-    loadscores()
-except:
-    LOG.error("Scores not loaded! Check / delete 'userscores.txt' file and "
-              "reboot bot")
-    Var.SWITCH = False
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        Var.worker = int(sys.argv[sys.argv.index("--worker") + 1])
+        LOG = logging.getLogger(f"TTB.worker{Var.worker}")
+    LOG.info("Bot started. Loading config and scores...")
+    mark = log_startup("imports", STARTED)
+    # A failed startup is not a !stop, so a supervised worker is
+    # started again
+    try:
+        loadconfig()
+        LOG.info("Config loaded.")
+    except (KeyError, ValueError):
+        LOG.error("Config not loaded! Check config file and reboot bot")
+        sys.exit(supervisor.STARTUP_FAILED)
+    mark = log_startup("config", mark)
+
+    if Var.worker is None and Var.workers > 1:
+        try:
+            asyncio.run(superviseworkers())
+        except KeyboardInterrupt:
+            pass
+        sys.exit()
 
-if Var.SWITCH:
     try:
-        s = socket.socket()
-        s.connect((ChatVar.HOST, ChatVar.PORT))
-        s.send(f"PASS {ChatVar.PASS}\r\n".encode("utf-8"))
-        s.send(f"NICK {ChatVar.NICK}\r\n".encode("utf-8"))
-        s.send(f"JOIN {ChatVar.CHAN}\r\n".encode("utf-8"))
-        time.sleep(1)
-        send_msg(Var.info_msg)
-        s.setblocking(0)
+        loadchannels()
     except:
-        LOG.error("Connection failed. Check config settings and reload bot.")
-        Var.SWITCH = False
-
-# Infinite loop while bot is active to scan messages & perform routines
-while Var.SWITCH:
-    if Var.is_active:
-        trivia_routinechecks()
-    scanloop()
-    time.sleep(1 / ChatVar.RATE)
+        LOG.error("Scores not loaded! Check / delete the "
+                  "'userscores_[channel].txt' files and reboot bot")
+        sys.exit(supervisor.STARTUP_FAILED)
+    log_startup("scores", mark)
+
+    asyncio.run(main())
+    # Only !stop stops all workers; a worker that stopped for any other
+    # reason (e.g. the connection was lost) is restarted by the supervisor
+    if Var.worker is not None:
+        if Var.stopped:
+            sys.exit(supervisor.STOPPED)
+        if Var.SWITCH:
+            sys.exit(1)
 
 # 0: Index
 # 0: Game